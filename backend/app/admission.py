@@ -0,0 +1,151 @@
+from typing import Dict, Optional, Tuple
+import asyncio
+import math
+import time
+from fastapi import HTTPException
+from redis.asyncio import Redis
+from redis.exceptions import NoScriptError
+from . import cache, rate_limit, redis_conn
+from .config import settings
+from .metrics import REJECTED
+from .queue import QUEUE_INTERACTIVE_SMALL
+from .rate_limit import RateLimitResult
+
+# Completions are counted in short buckets; throughput is their sum over
+# ADMISSION_WINDOW_SECONDS.
+_BUCKET_SECONDS = 10
+
+_broker: Optional[Redis] = None
+# (queue, priority) -> (computed_at, estimated_wait_ms), shared by requests
+# within ADMISSION_REFRESH_MS
+_estimates: Dict[Tuple[str, int], Tuple[float, Optional[int]]] = {}
+
+
+async def admit(ip: str, code_hash: str) -> Tuple[RateLimitResult, Optional[str]]:
+    """Rate-limit check plus review-cache lookup for one submission.
+
+    When the limiter and the cache resolve to the same Redis client both go
+    out in one pipelined round trip; otherwise they run concurrently.
+    """
+    local = cache.local_review_id(code_hash)
+    if local is not None:
+        return await rate_limit.limit_check(ip), local
+
+    r = await cache.get_cache()
+    if r is not await rate_limit.get_rate_redis():
+        quota, review_id = await asyncio.gather(
+            rate_limit.limit_check(ip), cache.cache_get_review_id(code_hash)
+        )
+        return quota, review_id
+
+    script = await rate_limit.get_script()
+    keys, args, limits = rate_limit.prepare(ip)
+    key = cache.codehash_key(code_hash)
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.evalsha(script.sha, len(keys), *keys, *args)
+        pipe.get(key).pttl(key)
+        raw, review_id, pttl = await pipe.execute(raise_on_error=False)
+
+    if isinstance(raw, NoScriptError):
+        # first call against this server: the script object loads itself
+        raw = await script(keys=keys, args=args)
+    for reply in (raw, review_id, pttl):
+        if isinstance(reply, Exception):
+            raise reply
+
+    cache.remember_review_id(code_hash, review_id, pttl)
+    return rate_limit.interpret(raw, limits), review_id
+
+
+def _broker_keys(queue: str, priority: int) -> list:
+    """The Redis lists of `queue` served no later than `priority` (one per step)."""
+    return [queue] + [f"{queue}:{p}" for p in range(1, priority + 1)]
+
+
+def _throughput_key(queue: str, bucket: int) -> str:
+    return f"{settings.CACHE_PREFIX}tput:{queue}:{bucket}"
+
+
+async def init_admission():
+    global _broker
+    if _broker is None:
+        _broker = redis_conn.acquire(settings.CELERY_BROKER_URL)
+    return _broker
+
+
+async def close_admission():
+    global _broker
+    if _broker is not None:
+        _broker = None
+        _estimates.clear()
+        await redis_conn.release(settings.CELERY_BROKER_URL)
+
+
+async def queue_depth(queue: str, priority: int) -> int:
+    """Tasks in `queue` that run before a new one sent with `priority`."""
+    broker = await init_admission()
+    async with broker.pipeline(transaction=False) as pipe:
+        for key in _broker_keys(queue, priority):
+            pipe.llen(key)
+        return sum(await pipe.execute())
+
+
+async def throughput(queue: str) -> float:
+    """Reviews from `queue` finished per second, over the recent window."""
+    now = time.time()
+    current = int(now // _BUCKET_SECONDS)
+    n = max(1, settings.ADMISSION_WINDOW_SECONDS // _BUCKET_SECONDS)
+    r = await cache.get_cache()
+    keys = [_throughput_key(queue, b) for b in range(current - n + 1, current + 1)]
+    counts = await r.mget(keys)
+    done = sum(int(c) for c in counts if c)
+    elapsed = (n - 1) * _BUCKET_SECONDS + (now - current * _BUCKET_SECONDS)
+    return done / max(elapsed, 1.0)
+
+
+async def record_completion(queue: Optional[str] = None):
+    """Called by the worker once per finished review (completed or failed)."""
+    bucket = int(time.time() // _BUCKET_SECONDS)
+    key = _throughput_key(queue or QUEUE_INTERACTIVE_SMALL, bucket)
+    r = await cache.get_cache()
+    async with r.pipeline(transaction=False) as pipe:
+        pipe.incr(key).expire(key, settings.ADMISSION_WINDOW_SECONDS + _BUCKET_SECONDS)
+        await pipe.execute()
+
+
+async def estimate_wait_ms(queue: str, priority: int = 0) -> Optional[int]:
+    """Projected queueing delay for a review routed to `queue`; None when unknown.
+
+    That is the case when work is queued but nothing finished recently
+    (cold start or stalled workers), so no rate is known yet. Other queues
+    are drained by their own workers and do not count.
+    """
+    now = time.monotonic()
+    fresh_for = settings.ADMISSION_REFRESH_MS / 1000
+    cached = _estimates.get((queue, priority))
+    if cached is not None and now - cached[0] < fresh_for:
+        return cached[1]
+
+    depth, rate = await asyncio.gather(queue_depth(queue, priority), throughput(queue))
+    if depth == 0:
+        wait = 0
+    elif rate > 0:
+        wait = int(depth / rate * 1000)
+    else:
+        wait = None
+    _estimates[(queue, priority)] = (now, wait)
+    return wait
+
+
+async def check_capacity(queue: str, priority: int = 0) -> Optional[int]:
+    """Estimated wait for a new review, or 503 + Retry-After past the SLO."""
+    wait = await estimate_wait_ms(queue, priority)
+    slo = settings.ADMISSION_MAX_WAIT_MS
+    if slo and wait is not None and wait > slo:
+        REJECTED.labels("overloaded").inc()
+        raise HTTPException(
+            status_code=503,
+            detail="Review queue is saturated, retry later",
+            headers={"Retry-After": str(math.ceil((wait - slo) / 1000))},
+        )
+    return wait
@@ -1,14 +1,24 @@
 import json
 import time
+from typing import List, Optional, Tuple
 from tenacity import (
     retry,
     stop_after_attempt,
     wait_exponential,
 )
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from .config import settings
+from .metrics import LLM_MALFORMED, count_retry, observe_llm
+from .schemas import MalformedReview, canonical_review
+from .tracing import span
+from .tokens import count_tokens, max_output_tokens, minify
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+MODEL = "gpt-4o-mini"
+
+client = OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+async_client = AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL
+)
 
 
 SYSTEM_MESSAGE = """
@@ -58,23 +68,193 @@ Output must be valid JSON per the schema. If code is trivial or N/A for a sectio
 """
 
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=10))
-def review_code_sync(language: str, code: str) -> dict:
-    start = time.time()
+BATCH_ADDENDUM = """
+Batch mode: the user message contains several independent snippets, each
+introduced by "### Item <id> (<language>)". Review each one on its own and
+return ONLY {"results": [{"id": <id>, ...}, ...]} where every element has the
+item id plus exactly the top-level keys described above.
+"""
+
+
+DIFF_ADDENDUM = """
+Incremental mode: the user message has the previous review's issues
+(numbered) and a unified diff of the latest change. Review ONLY the changed
+lines and their immediate context. Report only NEW problems in the usual
+keys, set "score" for the whole file after the change (starting from the
+previous score), and add one extra key "resolved": an array of the numbers of
+previous issues the change fixes or makes irrelevant.
+"""
+
+
+def _request(language: str, code: str) -> dict:
+    # chunked reviews pass "python (excerpt: ...)" as the language
+    code = minify(language.split(" ", 1)[0], code)
     prompt_user = f"Language: {language}\nCode:\n```\n{code}\nTask: Review the code. Focus on correctness, security, performance, readability, maintainability, testability. Produce ONLY the JSON specified by the system message.```"
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
+    return dict(
+        model=MODEL,
         messages=[
             {"role": "system", "content": SYSTEM_MESSAGE},
             {"role": "user", "content": prompt_user},
         ],
         temperature=0.1,
-        max_tokens=900,
+        max_tokens=max_output_tokens(count_tokens(prompt_user)),
         response_format={"type": "json_object"},
         seed=42,
     )
-    content = resp.choices[0].message.content.strip()
-    data = json.loads(content)
+
+
+def _usage(resp) -> dict:
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return {}
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+    }
+
+
+def _share(total: int, parts: int, index: int) -> int:
+    """`index`'s part of `total` split evenly; the parts sum to `total`."""
+    return total // parts + (1 if index < total % parts else 0)
+
+
+def _parse(resp, start: float, kind: str = "single", max_tokens: int = 0) -> dict:
+    observe_llm(kind, resp, start)
+    content = (resp.choices[0].message.content or "").strip()
+    try:
+        # Invalid JSON or shape raises here, inside the tenacity retry.
+        data = canonical_review(
+            json.loads(content),
+            require_score=kind != "diff",
+            keep=("resolved",) if kind == "diff" else (),
+        )
+    except ValueError:
+        LLM_MALFORMED.labels(kind).inc()
+        raise
     data["duration_ms"] = int((time.time() - start) * 1000)
-    data["model"] = "gpt-4o-mini"
+    data["model"] = MODEL
+    data.update(_usage(resp), max_tokens=max_tokens)
     return data
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(min=1, max=10),
+    before_sleep=count_retry("single"),
+)
+def review_code_sync(language: str, code: str) -> dict:
+    start = time.time()
+    req = _request(language, code)
+    with span("llm.review", model=MODEL, language=language):
+        resp = client.chat.completions.create(**req)
+    return _parse(resp, start, max_tokens=req["max_tokens"])
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(min=1, max=10),
+    before_sleep=count_retry("single"),
+)
+async def review_code_async(language: str, code: str) -> dict:
+    start = time.time()
+    req = _request(language, code)
+    with span("llm.review", model=MODEL, language=language):
+        resp = await async_client.chat.completions.create(**req)
+    return _parse(resp, start, max_tokens=req["max_tokens"])
+
+
+@retry(
+    stop=stop_after_attempt(2),
+    wait=wait_exponential(min=1, max=4),
+    before_sleep=count_retry("batch"),
+)
+async def review_batch_async(items: List[Tuple[str, str]]) -> List[Optional[dict]]:
+    """Review several small snippets in one call; None marks unanswered items."""
+    start = time.time()
+    snippets = [minify(language, code) for language, code in items]
+    prompt_user = "\n\n".join(
+        f"### Item {i} ({language})\n```\n{snippet}\n```"
+        for i, ((language, _), snippet) in enumerate(zip(items, snippets))
+    )
+    # each item gets its own answer budget; the total stays bounded
+    max_tokens = min(sum(max_output_tokens(count_tokens(c)) for c in snippets), 4000)
+    with span("llm.review_batch", model=MODEL, batch_size=len(items)):
+        resp = await async_client.chat.completions.create(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": SYSTEM_MESSAGE + BATCH_ADDENDUM},
+                {"role": "user", "content": prompt_user},
+            ],
+            temperature=0.1,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"},
+            seed=42,
+        )
+    observe_llm("batch", resp, start)
+    try:
+        data = json.loads((resp.choices[0].message.content or "").strip())
+    except ValueError:
+        LLM_MALFORMED.labels("batch").inc()
+        raise
+    duration_ms = int((time.time() - start) * 1000)
+    usage = _usage(resp)
+
+    out: List[Optional[dict]] = [None] * len(items)
+    for res in data.get("results") or []:
+        if not isinstance(res, dict):
+            continue
+        idx = res.pop("id", None)
+        if isinstance(idx, int) and 0 <= idx < len(items) and out[idx] is None:
+            try:
+                res = canonical_review(res)
+            except MalformedReview:
+                # left as None: the item falls back to a single review
+                LLM_MALFORMED.labels("batch").inc()
+                continue
+            res["duration_ms"] = duration_ms
+            res["model"] = MODEL
+            res["batch_size"] = len(items)
+            # usage is for the whole request: store each item's even share so
+            # summing reviews gives the real cost; the totals stay alongside
+            res.update(
+                {k: _share(v, len(items), idx) for k, v in usage.items()},
+                max_tokens=max_tokens,
+            )
+            if usage:
+                res["batch_usage"] = usage
+            out[idx] = res
+    return out
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential(min=1, max=10),
+    before_sleep=count_retry("diff"),
+)
+async def review_diff_async(
+    language: str, diff: str, prior_issues: List[dict], prior_score: Optional[int]
+) -> dict:
+    start = time.time()
+    previous = "\n".join(
+        f"{i}. [{it.get('severity', 'med')}] {it.get('title', '')}"
+        for i, it in enumerate(prior_issues)
+    )
+    prompt_user = (
+        f"Language: {language}\nPrevious score: {prior_score}\n"
+        f"Previous issues:\n{previous or '(none)'}\n"
+        f"Diff:\n```diff\n{diff}\n```"
+    )
+    max_tokens = max_output_tokens(count_tokens(prompt_user))
+    with span("llm.review_diff", model=MODEL, language=language):
+        resp = await async_client.chat.completions.create(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": SYSTEM_MESSAGE + DIFF_ADDENDUM},
+                {"role": "user", "content": prompt_user},
+            ],
+            temperature=0.1,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"},
+            seed=42,
+        )
+    return _parse(resp, start, "diff", max_tokens)
@@ -0,0 +1,93 @@
+from typing import List, Optional, Set, Tuple
+import asyncio
+from . import ai
+from .config import settings
+from .tokens import count_tokens
+
+
+def estimate_tokens(code: str) -> int:
+    return count_tokens(code)
+
+
+def is_small(code: str) -> bool:
+    return code.count("\n") < settings.LLM_BATCH_MAX_LINES
+
+
+class MicroBatcher:
+    """Groups small reviews into one multi-item LLM request.
+
+    A batch is sent when it reaches ``max_items`` or ``max_tokens``, or
+    ``max_wait_ms`` after its first item arrived, whichever comes first. Items
+    the batched answer does not cover are reviewed individually.
+    """
+
+    def __init__(self, max_items: int, max_tokens: int, max_wait_ms: int):
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+        self.max_wait_ms = max_wait_ms
+        self._pending: List[Tuple[str, str, asyncio.Future]] = []
+        self._tokens = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    async def review(self, language: str, code: str) -> dict:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        tokens = estimate_tokens(code)
+        if self._pending and self._tokens + tokens > self.max_tokens:
+            self._flush()
+        self._pending.append((language, code, fut))
+        self._tokens += tokens
+        if len(self._pending) >= self.max_items or self._tokens >= self.max_tokens:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000.0, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._tokens = self._pending, [], 0
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, batch: List[Tuple[str, str, asyncio.Future]]):
+        results: List[Optional[dict]] = [None] * len(batch)
+        if len(batch) > 1:
+            try:
+                results = await ai.review_batch_async(
+                    [(language, code) for language, code, _ in batch]
+                )
+            except Exception:
+                pass
+
+        async def settle(item, data):
+            language, code, fut = item
+            if data is None:
+                try:
+                    data = await ai.review_code_async(language, code)
+                except Exception as e:
+                    if not fut.done():
+                        fut.set_exception(e)
+                    return
+            if not fut.done():
+                fut.set_result(data)
+
+        await asyncio.gather(*(settle(it, d) for it, d in zip(batch, results)))
+
+
+_batcher: Optional[MicroBatcher] = None
+
+
+def get_batcher() -> MicroBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = MicroBatcher(
+            max_items=settings.LLM_BATCH_MAX_ITEMS,
+            max_tokens=settings.LLM_BATCH_MAX_TOKENS,
+            max_wait_ms=settings.LLM_BATCH_MAX_WAIT_MS,
+        )
+    return _batcher
@@ -0,0 +1,93 @@
+"""Content-addressed, compressed store for submitted source code.
+
+Each distinct source text is stored once in `code_blobs`, keyed by the sha256
+of its exact bytes; submissions keep only that key (`code_blob`). The cache's
+`code_hash` is not used as the key because it is computed over normalized
+code, so different texts share it. zstandard is a requirement; the zlib
+fallback only covers environments installed without it.
+"""
+
+import hashlib
+from datetime import datetime
+import zlib
+from bson import Binary
+from pymongo.errors import DuplicateKeyError
+from .config import settings
+from . import db
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - installs without requirements.txt
+    zstandard = None
+
+
+def blob_id(code: str) -> str:
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def compress(data: bytes) -> tuple:
+    """(codec, payload) using CODE_BLOB_COMPRESSION, zlib if zstd is missing."""
+    codec = settings.CODE_BLOB_COMPRESSION
+    if codec == "zstd" and zstandard is None:
+        codec = "zlib"
+    if codec == "zstd":
+        return codec, zstandard.ZstdCompressor(level=3).compress(data)
+    if codec == "zlib":
+        return codec, zlib.compress(data, 6)
+    return "none", data
+
+
+def decompress(codec: str, payload: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd code blobs")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    if codec == "zlib":
+        return zlib.decompress(payload)
+    return payload
+
+
+async def put_code(code: str) -> str:
+    """Store `code` unless an identical blob exists; returns its key."""
+    key = blob_id(code)
+    raw = code.encode("utf-8")
+    codec, payload = compress(raw)
+    try:
+        await db.code_blobs.update_one(
+            {"_id": key},
+            {
+                "$setOnInsert": {
+                    "codec": codec,
+                    "data": Binary(payload),
+                    "size": len(raw),
+                    "stored_size": len(payload),
+                    "created_at": datetime.utcnow().isoformat(),
+                }
+            },
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # a concurrent upsert of the same content won the insert
+        pass
+    return key
+
+
+async def get_code(key: str) -> str:
+    blob = await db.code_blobs.find_one({"_id": key})
+    if not blob:
+        raise ValueError(f"Code blob {key} not found")
+    return decompress(blob["codec"], bytes(blob["data"])).decode("utf-8")
+
+
+async def code_of(submission: dict) -> str:
+    """Source of a submission; older documents still embed it inline."""
+    if "code" in submission:
+        return submission["code"]
+    return await get_code(submission["code_blob"])
+
+
+async def store_code(code: str) -> dict:
+    """The code fields of a new submission document."""
+    if settings.CODE_BLOBS_ENABLED:
+        return {"code_blob": await put_code(code)}
+    return {"code": code}
@@ -1,9 +1,98 @@
-from typing import Optional
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
 import hashlib
-from redis.asyncio import Redis, from_url
+import os
+import time
+import uuid
+from redis.asyncio import Redis
 from .config import settings
+from . import redis_conn
+from .normalize import canonicalize
+from .metrics import CACHE_LOCAL
+from . import events
 
 _redis: Optional[Redis] = None
+_redis_url: Optional[str] = None
+
+
+class LocalLRU:
+    """Bounded, TTL-aware in-process cache in front of Redis."""
+
+    def __init__(self, maxsize: int, ttl: float, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # exported as cache_local_total{cache=name, event=...}
+        self._counters = (
+            {e: CACHE_LOCAL.labels(name, e) for e in ("hit", "miss", "eviction")}
+            if name
+            else {}
+        )
+
+    def _count(self, event: str):
+        counter = self._counters.get(event)
+        if counter is not None:
+            counter.inc()
+
+    def get(self, key: str) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            self._count("miss")
+            return None
+        expires, value = item
+        if expires <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            self._count("miss")
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        self._count("hit")
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(self.ttl, ttl)
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+            self._count("eviction")
+
+    def pop(self, key: str):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+_local = LocalLRU(
+    settings.CACHE_LOCAL_MAXSIZE, settings.CACHE_LOCAL_TTL_SECONDS, "codehash"
+)
+_payloads = LocalLRU(
+    settings.REVIEW_PAYLOAD_LOCAL_MAXSIZE, settings.REVIEW_PAYLOAD_TTL_SECONDS, "review"
+)
+# Tags our own invalidations; the pid keeps forked workers apart.
+_ORIGIN = uuid.uuid4().hex
+
+
+def _origin() -> str:
+    return f"{_ORIGIN}:{os.getpid()}"
 
 
 def _k(s: str) -> str:
@@ -11,9 +100,10 @@ def _k(s: str) -> str:
 
 
 async def init_cache(url: Optional[str] = None) -> Redis:
-    global _redis
+    global _redis, _redis_url
     if _redis is None:
-        _redis = from_url(url or settings.CACHE_REDIS_URL, decode_responses=True)
+        _redis_url = url or settings.CACHE_REDIS_URL
+        _redis = redis_conn.acquire(_redis_url)
     return _redis
 
 
@@ -26,10 +116,23 @@ async def get_cache() -> Redis:
 
 
 async def close_cache():
-    global _redis
+    global _redis, _redis_url
+    _local.clear()
+    _payloads.clear()
     if _redis is not None:
-        await _redis.aclose()
         _redis = None
+        await redis_conn.release(_redis_url)
+
+
+def _on_invalidate(event: dict):
+    if event.get("origin") == _origin():
+        return
+    _local.pop(event.get("key", ""))
+
+
+async def start_local_invalidation():
+    """Evict local entries when any process rewrites the Redis entry."""
+    await events.on("cache-invalidate", _on_invalidate)
 
 
 def _normalize(language: str, code: str) -> str:
@@ -38,15 +141,55 @@ def _normalize(language: str, code: str) -> str:
     return lang + "\n" + "\n".join(lines)
 
 
-def code_hash(language: str, code: str) -> str:
+def code_hash(language: str, code: str, level: Optional[int] = None) -> str:
+    """Hash used as the review cache key.
+
+    Level 0 only strips trailing whitespace (bare hex digest, the historical
+    format). Level 1 hashes the language's token stream without comments or
+    insignificant whitespace, prefixed with the canonicalizer's version tag.
+    """
+    if level is None:
+        level = settings.CACHE_NORMALIZATION_LEVEL
+    lang = (language or "").strip().lower()
+    canon = canonicalize(lang, code or "") if level >= 1 else None
+
     h = hashlib.sha256()
-    h.update(_normalize(language, code).encode("utf-8"))
-    return h.hexdigest()
+    if canon is None:
+        h.update(_normalize(language, code).encode("utf-8"))
+        return h.hexdigest()
+    tag, text = canon
+    h.update((lang + "\n" + text).encode("utf-8"))
+    return f"{tag}:{h.hexdigest()}"
+
+
+def codehash_key(code_hash: str) -> str:
+    return _k(f"codehash:{code_hash}")
+
+
+def local_review_id(code_hash: str) -> Optional[str]:
+    return _local.get(codehash_key(code_hash))
+
+
+def remember_review_id(code_hash: str, value: Optional[str], pttl: int):
+    """Fill the local tier from a GET + PTTL reply."""
+    if value is not None:
+        # never keep a local copy past the Redis expiry
+        _local.set(
+            codehash_key(code_hash), value, ttl=pttl / 1000.0 if pttl > 0 else None
+        )
 
 
 async def cache_get_review_id(code_hash: str) -> Optional[str]:
+    value = local_review_id(code_hash)
+    if value is not None:
+        return value
+
     r = await get_cache()
-    return await r.get(_k(f"codehash:{code_hash}"))
+    key = codehash_key(code_hash)
+    async with r.pipeline(transaction=False) as pipe:
+        value, pttl = await pipe.get(key).pttl(key).execute()
+    remember_review_id(code_hash, value, pttl)
+    return value
 
 
 async def cache_set_review_id(
@@ -55,3 +198,93 @@ async def cache_set_review_id(
     r = await get_cache()
     key = _k(f"codehash:{code_hash}")
     await r.set(key, review_id, ex=ttl or int(settings.CACHE_TTL_SECONDS))
+    await events.publish("cache-invalidate", {"key": key, "origin": _origin()})
+    _local.set(key, review_id)
+
+
+async def cache_invalidate(code_hash: str):
+    r = await get_cache()
+    key = _k(f"codehash:{code_hash}")
+    await r.delete(key)
+    _local.pop(key)
+    await events.publish("cache-invalidate", {"key": key, "origin": _origin()})
+
+
+async def cache_get_review_payload(submission_id: str) -> Optional[str]:
+    key = _k(f"review:{submission_id}")
+    value = _payloads.get(key)
+    if value is not None:
+        return value
+    r = await get_cache()
+    value = await r.get(key)
+    if value is not None:
+        _payloads.set(key, value)
+    return value
+
+
+async def cache_set_review_payloads(payloads: dict, ttl: Optional[int] = None):
+    """Store serialized ReviewOut bodies for terminal submissions, by id."""
+    if not payloads:
+        return
+    r = await get_cache()
+    ex = ttl or int(settings.REVIEW_PAYLOAD_TTL_SECONDS)
+    async with r.pipeline(transaction=False) as pipe:
+        for submission_id, body in payloads.items():
+            pipe.set(_k(f"review:{submission_id}"), body, ex=ex)
+        await pipe.execute()
+    for submission_id, body in payloads.items():
+        _payloads.set(_k(f"review:{submission_id}"), body)
+
+
+_RELEASE_IF_OWNER = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+_EXPIRE_IF_OWNER = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+async def inflight_acquire(
+    code_hash: str, submission_id: str, ttl: Optional[int] = None
+) -> Optional[str]:
+    """Claim the single-flight slot for ``code_hash``.
+
+    Returns None when ``submission_id`` became the leader, otherwise the id of
+    the submission already being reviewed for this hash.
+    """
+    r = await get_cache()
+    key = _k(f"inflight:{code_hash}")
+    for _ in range(3):
+        if await r.set(
+            key, submission_id, nx=True, ex=ttl or int(settings.INFLIGHT_TTL_SECONDS)
+        ):
+            return None
+        leader = await r.get(key)
+        if leader:
+            return leader
+    return None
+
+
+async def inflight_leader(code_hash: str) -> Optional[str]:
+    r = await get_cache()
+    return await r.get(_k(f"inflight:{code_hash}"))
+
+
+async def inflight_refresh(code_hash: str, submission_id: str, ttl: int):
+    """Extend the slot while ``submission_id`` still holds it."""
+    r = await get_cache()
+    key = _k(f"inflight:{code_hash}")
+    await r.eval(_EXPIRE_IF_OWNER, 1, key, submission_id, ttl)
+
+
+async def inflight_release(code_hash: str, submission_id: str):
+    r = await get_cache()
+    await r.eval(_RELEASE_IF_OWNER, 1, _k(f"inflight:{code_hash}"), submission_id)
@@ -0,0 +1,156 @@
+from typing import List, NamedTuple, Optional, Tuple
+import ast
+import asyncio
+import re
+from . import ai
+from .config import settings
+from .tokens import over_budget
+
+_SEVERITY_RANK = {"low": 0, "med": 1, "high": 2}
+
+# Top-level declarations for the non-Python languages; matched only at
+# column 0 and brace depth 0.
+_DECL = re.compile(
+    r"^(?:export\s+|default\s+|pub(?:\([\w:]+\))?\s+|public\s+|private\s+|"
+    r"protected\s+|static\s+|final\s+|abstract\s+|async\s+|unsafe\s+)*"
+    r"(?:(?:def|fn|func|function|class|interface|impl|struct|enum|trait|module|"
+    r"type)\b|(?:const|let|var)\s+\w+\s*=\s*(?:async\s*)?(?:\(|function\b))"
+)
+_C_SIGNATURE = re.compile(
+    r"^[A-Za-z_][\w\s\*&<>:,\[\]]*\([^;]*\)\s*(?:const\s*)?\{?\s*$"
+)
+_STRINGS = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|`[^`]*`')
+_LINE_COMMENT = re.compile(r"//.*$|#.*$")
+
+
+class Chunk(NamedTuple):
+    start: int
+    end: int
+    text: str
+
+
+def _python_boundaries(lines: List[str]) -> List[int]:
+    tree = ast.parse("\n".join(lines))
+    starts = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            first = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            starts.append(first - 1)
+    return starts
+
+
+def _heuristic_boundaries(lines: List[str]) -> List[int]:
+    starts = []
+    depth = 0
+    for i, line in enumerate(lines):
+        if depth == 0 and line[:1].isalpha():
+            if _DECL.match(line) or _C_SIGNATURE.match(line.rstrip()):
+                starts.append(i)
+        bare = _LINE_COMMENT.sub("", _STRINGS.sub("", line))
+        depth = max(0, depth + bare.count("{") - bare.count("}"))
+    return starts
+
+
+def boundaries(language: str, lines: List[str]) -> List[int]:
+    if language == "python":
+        try:
+            return _python_boundaries(lines)
+        except SyntaxError:
+            pass
+    return _heuristic_boundaries(lines)
+
+
+def split_code(language: str, code: str, max_lines: int) -> List[Chunk]:
+    """Split at function/class boundaries into chunks of at most ``max_lines``."""
+    lines = code.splitlines()
+    cuts = sorted({0, *boundaries(language, lines), len(lines)})
+    segments = [(a, b) for a, b in zip(cuts, cuts[1:]) if b > a]
+
+    spans: List[Tuple[int, int]] = []
+    for a, b in segments:
+        # a single oversized function is cut at fixed line counts
+        while b - a > max_lines:
+            spans.append((a, a + max_lines))
+            a += max_lines
+        if spans and b - spans[-1][0] <= max_lines:
+            spans[-1] = (spans[-1][0], b)
+        else:
+            spans.append((a, b))
+
+    return [Chunk(a, b, "\n".join(lines[a:b])) for a, b in spans]
+
+
+def _dedupe(items: List[str]) -> List[str]:
+    seen = set()
+    out = []
+    for it in items:
+        key = str(it).strip().lower()
+        if key not in seen:
+            seen.add(key)
+            out.append(it)
+    return out
+
+
+def merge_reviews(parts: List[Tuple[dict, int]]) -> dict:
+    """Combine per-chunk reviews; scores are averaged weighted by chunk size."""
+    issues: dict = {}
+    lists: dict = {"security": [], "performance": [], "suggestions": []}
+    weighted = total_weight = 0
+    duration_ms = 0
+    usage = {"prompt_tokens": 0, "completion_tokens": 0}
+
+    for data, weight in parts:
+        score = data.get("score")
+        if isinstance(score, (int, float)):
+            weighted += score * weight
+            total_weight += weight
+        for it in data.get("issues") or []:
+            if not isinstance(it, dict):
+                continue
+            key = str(it.get("title", "")).strip().lower()
+            prev = issues.get(key)
+            if prev is None or _SEVERITY_RANK.get(
+                it.get("severity"), 1
+            ) > _SEVERITY_RANK.get(prev.get("severity"), 1):
+                issues[key] = it
+        for name in lists:
+            value = data.get(name) or []
+            lists[name].extend(value if isinstance(value, list) else [value])
+        duration_ms = max(duration_ms, int(data.get("duration_ms") or 0))
+        for name in usage:
+            usage[name] += int(data.get(name) or 0)
+
+    score: Optional[int] = None
+    if total_weight:
+        score = min(10, max(1, round(weighted / total_weight)))
+    return {
+        "score": score,
+        "issues": list(issues.values()),
+        **{name: _dedupe(values) for name, values in lists.items()},
+        "duration_ms": duration_ms,
+        "model": ai.MODEL,
+        "chunks": len(parts),
+        **usage,
+    }
+
+
+def is_large(language: str, code: str) -> bool:
+    if not settings.LARGE_FILE_ENABLED:
+        return False
+    return code.count("\n") + 1 > settings.LARGE_FILE_MIN_LINES or over_budget(
+        language, code
+    )
+
+
+async def review_chunked(language: str, code: str) -> dict:
+    chunks = split_code(language, code, settings.LARGE_FILE_CHUNK_LINES)
+    total = code.count("\n") + 1
+    sem = asyncio.Semaphore(settings.LARGE_FILE_MAX_PARALLEL)
+
+    async def one(chunk: Chunk) -> dict:
+        label = f"{language} (excerpt: lines {chunk.start + 1}-{chunk.end} of {total})"
+        async with sem:
+            return await ai.review_code_async(label, chunk.text)
+
+    results = await asyncio.gather(*(one(c) for c in chunks))
+    return merge_reviews([(r, c.end - c.start) for r, c in zip(results, chunks)])
@@ -1,8 +1,10 @@
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     OPENAI_API_KEY: str = ""
+    OPENAI_BASE_URL: Optional[str] = None
     MONGODB_URI: str = "mongodb://localhost:27017"
     BACKEND_URL: str = "http://localhost:8000"
     FRONTEND_URL: str = "http://localhost:5173"
@@ -10,13 +12,71 @@ class Settings(BaseSettings):
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
 
+    WORKER_MODE: Literal["prefork", "async"] = "prefork"
+    WORKER_ASYNC_CONCURRENCY: int = 32
+    WORKER_METRICS_PORT: int = 0
+    WORKER_CLAIM_LEASE_SECONDS: int = 900
+
+    FAST_JSON_ENABLED: bool = False
+
+    TRACING_EXPORTER: Literal["none", "jsonl", "otlp"] = "none"
+    TRACING_JSONL_PATH: str = "traces-{service}-{pid}.jsonl"
+
+    QUEUE_LARGE_MIN_TOKENS: int = 2000
+    FAIR_MAX_INTERACTIVE_INFLIGHT: int = 4
+    FAIR_INFLIGHT_TTL_SECONDS: int = 3600
+
+    ADMISSION_MAX_WAIT_MS: int = 0
+    ADMISSION_WINDOW_SECONDS: int = 300
+    ADMISSION_REFRESH_MS: int = 1000
+
+    LLM_BATCH_ENABLED: bool = False
+    LLM_BATCH_MAX_LINES: int = 40
+    LLM_BATCH_MAX_ITEMS: int = 8
+    LLM_BATCH_MAX_TOKENS: int = 3000
+    LLM_BATCH_MAX_WAIT_MS: int = 50
+
+    LARGE_FILE_ENABLED: bool = True
+    LARGE_FILE_MIN_LINES: int = 400
+    LARGE_FILE_CHUNK_LINES: int = 200
+    LARGE_FILE_MAX_PARALLEL: int = 8
+
+    TOKEN_MINIFY_ENABLED: bool = True
+    LLM_INPUT_TOKEN_BUDGET: int = 12000
+    LLM_OUTPUT_TOKENS_MIN: int = 500
+    LLM_OUTPUT_TOKENS_MAX: int = 1500
+    LLM_OUTPUT_TOKENS_RATIO: float = 0.5
+
+    MONGO_TRANSACTIONS: bool = False
+    CODE_BLOBS_ENABLED: bool = True
+    CODE_BLOB_COMPRESSION: Literal["zstd", "zlib", "none"] = "zstd"
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_MAX_ITEMS: int = 100
+    WRITE_BEHIND_MAX_WAIT_MS: int = 20
+
+    DIFF_CONTEXT_LINES: int = 3
+    DIFF_MAX_CHANGED_RATIO: float = 0.5
+
+    REDIS_MAX_CONNECTIONS: int = 64
+    REDIS_POOL_TIMEOUT_SECONDS: int = 5
+
     RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/1"
     RATE_LIMIT_PER_HOUR: int = 10
+    RATE_LIMIT_PER_MINUTE: int = 0
 
     CACHE_ENABLED: bool = True
     CACHE_REDIS_URL: str = "redis://localhost:6379/2"
     CACHE_TTL_SECONDS: int = 60 * 60 * 24 * 30
     CACHE_PREFIX: str = "acrev:"
+    CACHE_NORMALIZATION_LEVEL: int = 1
+    CACHE_LOCAL_MAXSIZE: int = 10_000
+    CACHE_LOCAL_TTL_SECONDS: int = 60
+    REVIEW_PAYLOAD_TTL_SECONDS: int = 60 * 60 * 24
+    REVIEW_PAYLOAD_LOCAL_MAXSIZE: int = 2_000
+    INFLIGHT_TTL_SECONDS: int = 15 * 60
+
+    EVENTS_REDIS_URL: str = "redis://localhost:6379/2"
+    SSE_RESYNC_SECONDS: int = 30
 
     model_config = SettingsConfigDict(
         env_file=".env",
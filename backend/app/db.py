@@ -2,19 +2,24 @@ from typing import Optional
 from motor.motor_asyncio import AsyncIOMotorClient
 from .config import settings
 from .indexes import ensure_indexes
+from .metrics import MongoListener
 
 client: Optional[AsyncIOMotorClient] = None
 db = None
 submissions = None
 reviews = None
+stats_hourly = None
+code_blobs = None
 
 
 async def init_db():
-    global client, db, submissions, reviews
+    global client, db, submissions, reviews, stats_hourly, code_blobs
     if client is not None:
         return
 
-    client = AsyncIOMotorClient(str(settings.MONGODB_URI))
+    client = AsyncIOMotorClient(
+        str(settings.MONGODB_URI), event_listeners=[MongoListener()]
+    )
 
     _db = client.get_default_database()
     if _db is not None:
@@ -24,6 +29,8 @@ async def init_db():
 
     submissions = db["submissions"]
     reviews = db["reviews"]
+    stats_hourly = db["stats_hourly"]
+    code_blobs = db["code_blobs"]
 
     await ensure_indexes(db)
 
@@ -36,14 +43,18 @@ async def close_db():
 
 
 def init_db_sync():
-    global client, db, submissions, reviews
+    global client, db, submissions, reviews, stats_hourly, code_blobs
     if client is not None:
         return
-    client = AsyncIOMotorClient(str(settings.MONGODB_URI))
+    client = AsyncIOMotorClient(
+        str(settings.MONGODB_URI), event_listeners=[MongoListener()]
+    )
     _db = client.get_default_database()
     db = _db if _db is not None else client["ai_code_review"]
     submissions = db["submissions"]
     reviews = db["reviews"]
+    stats_hourly = db["stats_hourly"]
+    code_blobs = db["code_blobs"]
 
 
 def close_db_sync():
@@ -0,0 +1,138 @@
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+from contextlib import asynccontextmanager
+import asyncio
+import json
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from .config import settings
+from . import redis_conn
+
+_events: Optional[Redis] = None
+_events_url: Optional[str] = None
+_reader: Optional[asyncio.Task] = None
+_subscribed: Optional[asyncio.Event] = None
+_listeners: Dict[str, Set[asyncio.Queue]] = {}
+_handlers: Dict[str, List[Callable[[dict], None]]] = {}
+
+
+def _channel(submission_id: str) -> str:
+    return f"{settings.CACHE_PREFIX}events:{submission_id}"
+
+
+async def init_events(url: Optional[str] = None) -> Redis:
+    global _events, _events_url
+    if _events is None:
+        _events_url = url or settings.EVENTS_REDIS_URL
+        _events = redis_conn.acquire(_events_url)
+    return _events
+
+
+async def get_events() -> Redis:
+    global _events
+    if _events is None:
+        await init_events()
+    assert _events is not None
+    return _events
+
+
+async def close_events():
+    global _events, _reader
+    if _reader is not None:
+        _reader.cancel()
+        try:
+            await _reader
+        except (asyncio.CancelledError, Exception):
+            pass
+        _reader = None
+    _listeners.clear()
+    _handlers.clear()
+    if _events is not None:
+        _events = None
+        await redis_conn.release(_events_url)
+
+
+def jsonable_review(review: dict) -> dict:
+    out = dict(review)
+    if "_id" in out:
+        out["_id"] = str(out["_id"])
+    if "submission_id" in out:
+        out["submission_id"] = str(out["submission_id"])
+    return out
+
+
+async def publish(topic: str, event: dict):
+    r = await get_events()
+    await r.publish(_channel(topic), json.dumps(event))
+
+
+async def publish_status(
+    submission_id: str, status: str, review: Optional[dict] = None, **extra
+):
+    event = {"status": status, **extra}
+    if review is not None:
+        event["review"] = jsonable_review(review)
+    await publish(submission_id, event)
+
+
+async def _dispatch(subscribed: asyncio.Event):
+    prefix_len = len(_channel(""))
+    while True:
+        r = await get_events()
+        pubsub = r.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.psubscribe(_channel("*"))
+            subscribed.set()
+            async for msg in pubsub.listen():
+                if msg.get("type") != "pmessage":
+                    continue
+                topic = msg["channel"][prefix_len:]
+                queues = _listeners.get(topic)
+                handlers = _handlers.get(topic)
+                if not queues and not handlers:
+                    continue
+                try:
+                    event = json.loads(msg["data"])
+                except ValueError:
+                    continue
+                for q in queues or ():
+                    q.put_nowait(event)
+                for handler in handlers or ():
+                    handler(event)
+        except RedisConnectionError:
+            await asyncio.sleep(1.0)
+        finally:
+            await pubsub.aclose()
+
+
+async def _ensure_reader():
+    global _reader, _subscribed
+    if _reader is None or _reader.done():
+        _subscribed = asyncio.Event()
+        _reader = asyncio.create_task(_dispatch(_subscribed))
+    assert _subscribed is not None
+    # subscribe before callers read current state so no transition is missed
+    try:
+        await asyncio.wait_for(_subscribed.wait(), timeout=5.0)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def on(topic: str, handler: Callable[[dict], None]):
+    """Call ``handler`` for every event published on ``topic`` in this process."""
+    _handlers.setdefault(topic, []).append(handler)
+    await _ensure_reader()
+
+
+@asynccontextmanager
+async def listen(submission_id: str) -> AsyncIterator[asyncio.Queue]:
+    await _ensure_reader()
+    q: asyncio.Queue = asyncio.Queue()
+    _listeners.setdefault(submission_id, set()).add(q)
+    try:
+        yield q
+    finally:
+        queues = _listeners.get(submission_id)
+        if queues is not None:
+            queues.discard(q)
+            if not queues:
+                _listeners.pop(submission_id, None)
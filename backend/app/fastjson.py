@@ -0,0 +1,60 @@
+"""Opt-in fast JSON for the read endpoints (FAST_JSON_ENABLED).
+
+Canonical stored reviews (schema_version current) already have the exact
+ReviewOut shape, so their response body can be written straight from the
+Mongo documents without building and re-validating models. orjson is a
+requirement; the stdlib fallback, which still skips the models, only covers
+environments installed without it.
+"""
+
+from datetime import datetime
+import json
+from typing import Optional
+from bson import ObjectId
+from .schemas import REVIEW_SCHEMA_VERSION, ReviewOut
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - installs without requirements.txt
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json.dumps(
+        obj, default=_default, separators=(",", ":"), ensure_ascii=False
+    ).encode()
+
+
+def review_out(submission: dict, review: Optional[dict]) -> dict:
+    """The ReviewOut JSON object for stored docs, same keys and order."""
+    if review is not None and review.get("schema_version") != REVIEW_SCHEMA_VERSION:
+        # legacy documents still need the validators' repairs
+        return ReviewOut.from_docs(submission, review).model_dump(mode="json")
+    created_at = submission["created_at"]
+    updated_at = submission["updated_at"]
+    if not isinstance(created_at, str) or not isinstance(updated_at, str):
+        return ReviewOut.from_docs(submission, review).model_dump(mode="json")
+    r = review or {}
+    return {
+        "id": str(submission["_id"]),
+        "status": submission["status"],
+        "created_at": created_at,
+        "updated_at": updated_at,
+        "language": submission["language"],
+        "score": r.get("score"),
+        "issues": r.get("issues", []) if review else None,
+        "security": r.get("security", []) if review else None,
+        "performance": r.get("performance", []) if review else None,
+        "suggestions": r.get("suggestions", []) if review else None,
+        "error": submission.get("error"),
+    }
@@ -0,0 +1,58 @@
+from typing import List, Optional, Tuple
+import difflib
+from . import ai
+from .chunking import merge_reviews
+from .config import settings
+
+
+def changed_hunks(old: str, new: str, context: int) -> Tuple[str, int]:
+    """Unified diff of old -> new and the number of added/removed lines."""
+    diff = list(
+        difflib.unified_diff(
+            old.splitlines(),
+            new.splitlines(),
+            "base",
+            "current",
+            lineterm="",
+            n=context,
+        )
+    )
+    changed = sum(
+        1 for ln in diff if ln[:1] in "+-" and not ln.startswith(("+++", "---"))
+    )
+    return "\n".join(diff), changed
+
+
+async def review_incremental(
+    language: str, old_code: str, new_code: str, prior: dict
+) -> Optional[dict]:
+    """Review only what changed since ``prior``; None means do a full review."""
+    diff, changed = changed_hunks(old_code, new_code, settings.DIFF_CONTEXT_LINES)
+    prior_issues: List[dict] = [
+        it for it in prior.get("issues") or [] if isinstance(it, dict)
+    ]
+    carried = {
+        "score": prior.get("score"),
+        "issues": prior_issues,
+        "security": prior.get("security") or [],
+        "performance": prior.get("performance") or [],
+        "suggestions": prior.get("suggestions") or [],
+    }
+    if changed == 0:
+        return {**carried, "duration_ms": 0, "model": prior.get("model", ai.MODEL)}
+
+    total = max(1, len(new_code.splitlines()))
+    if changed / total > settings.DIFF_MAX_CHANGED_RATIO:
+        return None
+
+    data = await ai.review_diff_async(language, diff, prior_issues, prior.get("score"))
+    resolved = {i for i in data.pop("resolved", None) or [] if isinstance(i, int)}
+    carried["issues"] = [it for i, it in enumerate(prior_issues) if i not in resolved]
+
+    merged = merge_reviews([(carried, 1), (data, 1)])
+    merged.pop("chunks", None)
+    score = data.get("score")
+    merged["score"] = score if isinstance(score, int) else carried["score"]
+    merged["duration_ms"] = data.get("duration_ms", 0)
+    merged["diff_changed_lines"] = changed
+    return merged
@@ -9,9 +9,31 @@ async def ensure_indexes(db):
             [("language", ASCENDING), ("created_at", DESCENDING)],
             name="sub_lang_created",
         ),
+        IndexModel(
+            [("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="sub_created_id",
+        ),
+        IndexModel(
+            [("language", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="sub_lang_created_id",
+        ),
+        IndexModel(
+            [
+                ("language", ASCENDING),
+                ("score", ASCENDING),
+                ("created_at", DESCENDING),
+                ("_id", DESCENDING),
+            ],
+            name="sub_lang_score_created",
+        ),
         IndexModel(
             [("ip", ASCENDING), ("created_at", DESCENDING)], name="sub_ip_created"
         ),
+        IndexModel(
+            [("status", ASCENDING), ("created_at", DESCENDING)],
+            name="sub_status_created",
+        ),
+        IndexModel([("leader_id", ASCENDING)], name="sub_leader", sparse=True),
     ]
 
     rev_indexes = [
@@ -26,5 +48,13 @@ async def ensure_indexes(db):
         IndexModel([("issues.title", ASCENDING)], name="rev_issues_title"),
     ]
 
+    rollup_indexes = [
+        IndexModel(
+            [("language", ASCENDING), ("hour", ASCENDING)], name="roll_lang_hour"
+        ),
+        IndexModel([("hour", ASCENDING)], name="roll_hour"),
+    ]
+
     await db["submissions"].create_indexes(sub_indexes)
     await db["reviews"].create_indexes(rev_indexes)
+    await db["stats_hourly"].create_indexes(rollup_indexes)
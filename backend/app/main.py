@@ -4,10 +4,14 @@ from contextlib import asynccontextmanager
 from urllib.parse import urlparse
 
 from .config import settings
-from .routes import reviews, stats, health
+from .routes import reviews, stats, health, metrics
 from .db import init_db, close_db
-from .cache import init_cache, close_cache
+from .cache import init_cache, close_cache, start_local_invalidation
+from .events import init_events, close_events
 from .rate_limit import init_rate_limiter, close_rate_limiter
+from .admission import init_admission, close_admission
+from .metrics import MetricsMiddleware
+from .tracing import init_tracing, shutdown_tracing
 
 
 def origin_from_url(url: str) -> str:
@@ -17,15 +21,22 @@ def origin_from_url(url: str) -> str:
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    init_tracing("api")
     await init_db()
     await init_cache()
     await init_rate_limiter()
+    await init_events()
+    await init_admission()
+    await start_local_invalidation()
     try:
         yield
     finally:
+        await close_admission()
+        await close_events()
         await close_rate_limiter()
         await close_cache()
         await close_db()
+        shutdown_tracing()
 
 
 app = FastAPI(title="AI Code Review", version="0.1.0", lifespan=lifespan)
@@ -42,8 +53,17 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["GET", "POST", "OPTIONS"],
     allow_headers=["*"],
-    expose_headers=["Location"],
+    expose_headers=[
+        "Location",
+        "X-Next-Cursor",
+        "X-RateLimit-Limit",
+        "X-RateLimit-Remaining",
+        "X-RateLimit-Reset",
+        "Retry-After",
+    ],
 )
+app.add_middleware(MetricsMiddleware)
 app.include_router(health.router)
+app.include_router(metrics.router)
 app.include_router(reviews.router)
 app.include_router(stats.router)
@@ -0,0 +1,166 @@
+"""Prometheus metrics for the API and the worker.
+
+Counters and histograms only, so the same definitions work in
+prometheus_client's multiprocess mode: set PROMETHEUS_MULTIPROC_DIR (an empty
+directory) for `uvicorn --workers N` and for prefork Celery workers and every
+process's samples are aggregated at scrape time.
+"""
+
+import os
+import time
+from typing import Optional
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    REGISTRY,
+    multiprocess,
+)
+from pymongo import monitoring
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from .tracing import record_span, span
+
+_FAST = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+_SLOW = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time to response headers, per route template",
+    ["method", "route", "status"],
+)
+QUEUE_WAIT = Histogram(
+    "review_queue_wait_seconds",
+    "Submission created_at to worker pickup",
+    buckets=_SLOW,
+)
+LLM_DURATION = Histogram(
+    "llm_request_duration_seconds",
+    "Model call duration",
+    ["kind"],
+    buckets=_SLOW,
+)
+LLM_RETRIES = Counter("llm_retries_total", "Model calls retried", ["kind"])
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens used", ["kind", "type"])
+LLM_MALFORMED = Counter(
+    "llm_malformed_responses_total", "Model answers rejected as invalid", ["kind"]
+)
+MONGO_LATENCY = Histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB command latency",
+    ["command"],
+    buckets=_FAST,
+)
+REDIS_LATENCY = Histogram(
+    "redis_command_duration_seconds",
+    "Redis command latency",
+    ["command"],
+    buckets=_FAST,
+)
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups", ["cache", "result"])
+CACHE_LOCAL = Counter(
+    "cache_local_total",
+    "In-process cache tier hits, misses and evictions",
+    ["cache", "event"],
+)
+REJECTED = Counter("submissions_rejected_total", "Submissions turned away", ["reason"])
+REVIEWS = Counter("reviews_total", "Reviews finished by the worker", ["status"])
+
+
+def registry() -> CollectorRegistry:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        reg = CollectorRegistry()
+        multiprocess.MultiProcessCollector(reg)
+        return reg
+    return REGISTRY
+
+
+def count_retry(kind: str):
+    """tenacity before_sleep hook: one tick per retried attempt."""
+
+    def _before_sleep(retry_state):
+        LLM_RETRIES.labels(kind).inc()
+
+    return _before_sleep
+
+
+def observe_llm(kind: str, resp, start: float):
+    LLM_DURATION.labels(kind).observe(time.time() - start)
+    usage = getattr(resp, "usage", None)
+    if usage is not None:
+        LLM_TOKENS.labels(kind, "prompt").inc(usage.prompt_tokens or 0)
+        LLM_TOKENS.labels(kind, "completion").inc(usage.completion_tokens or 0)
+
+
+class MongoListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._observe(event)
+
+    def failed(self, event):
+        self._observe(event)
+
+    @staticmethod
+    def _observe(event):
+        # Motor runs the driver with the caller's context, so the span nests
+        # under whatever span issued the command.
+        seconds = event.duration_micros / 1e6
+        MONGO_LATENCY.labels(event.command_name).observe(seconds)
+        record_span(
+            f"mongo {event.command_name}",
+            seconds,
+            **{"db.system": "mongodb", "db.name": event.database_name},
+        )
+
+
+class TimedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            with span("redis PIPELINE", **{"db.system": "redis"}):
+                return await super().execute(raise_on_error=raise_on_error)
+        finally:
+            REDIS_LATENCY.labels("PIPELINE").observe(time.perf_counter() - start)
+
+
+class TimedRedis(Redis):
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).upper()
+        start = time.perf_counter()
+        try:
+            with span(f"redis {command}", **{"db.system": "redis"}):
+                return await super().execute_command(*args, **options)
+        finally:
+            REDIS_LATENCY.labels(command).observe(time.perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None):
+        return TimedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+
+class MetricsMiddleware:
+    """Pure ASGI timing, stopped at response start so SSE streams don't skew it."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                route = scope.get("route")
+                HTTP_LATENCY.labels(
+                    scope["method"],
+                    getattr(route, "path", "unmatched"),
+                    str(message["status"]),
+                ).observe(time.perf_counter() - start)
+            await send(message)
+
+        await self.app(scope, receive, _send)
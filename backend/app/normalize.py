@@ -0,0 +1,175 @@
+from typing import Callable, Dict, List, NamedTuple, Optional
+import io
+import re
+import tokenize
+
+
+class Ambiguous(ValueError):
+    """The lexer cannot tell code from literal text; hash the raw code instead."""
+
+
+class Canonicalizer(NamedTuple):
+    """Turns code into a token stream; ``tag`` versions its output in cache keys."""
+
+    tag: str
+    tokens: Callable[[str], List[str]]
+
+
+def _python_tokens(code: str) -> List[str]:
+    out: List[str] = []
+    for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+        if tok.type in (tokenize.COMMENT, tokenize.NL, tokenize.ENDMARKER):
+            continue
+        if tok.type == tokenize.NEWLINE:
+            out.append("\n")
+        elif tok.type == tokenize.INDENT:
+            out.append("<indent>")
+        elif tok.type == tokenize.DEDENT:
+            out.append("<dedent>")
+        else:
+            out.append(tok.string)
+    return out
+
+
+# After these a "/" starts a regex literal in JavaScript, not a division.
+_JS_REGEX_AFTER = frozenset(
+    "return typeof instanceof in of new delete void throw case do else yield"
+    " await".split()
+)
+# Ruby keywords and common methods that take a regex argument.
+_RB_REGEX_AFTER = frozenset(
+    "if elsif unless while until when and or not return then do puts p"
+    " split scan match gsub sub index grep".split()
+)
+
+# Multi-character operators, longest first, so that e.g. "a++ + b" and
+# "a + ++b" lex differently; like the compilers, the lexer takes the longest.
+_OPERATORS = (
+    r">>>=|<<=|>>=|===|!==|\*\*=|\?\?=|&&=|\|\|=|<=>|\.\.\.|>>>"
+    r"|\+\+|--|->|=>|<<|>>|&&|\|\||==|!=|<=|>=|::|\.\.|\*\*|\?\?|\?\."
+    r"|\+=|-=|\*=|/=|%=|&=|\|=|\^=|:="
+)
+
+
+def _regex_possible(prev: Optional[str], keywords: frozenset) -> bool:
+    if prev is None or prev in keywords:
+        return True
+    return not (prev[-1].isalnum() or prev[-1] in "_$)]")
+
+
+def _lexer(
+    comment: str,
+    newline_significant: bool = False,
+    regex_after: Optional[frozenset] = None,
+    spaced_regex: bool = False,
+    directives: bool = False,
+    ambiguous: Optional[str] = None,
+):
+    """Token lexer for C-like syntax.
+
+    ``regex_after`` enables the regex-literal check with the language's
+    keywords; ``spaced_regex`` also suspects "f /x/", where a space comes only
+    before the slash (a method call in Ruby). ``directives`` keeps ``#``
+    preprocessor lines verbatim, since whitespace matters in them, and code
+    matching ``ambiguous`` is never canonicalized.
+    """
+    directive = r"^[^\S\n]*\#(?:\\\n|[^\n])*" if directives else "(?!)"
+    pattern = re.compile(
+        rf"""
+        (?P<directive>{directive})
+        |(?P<comment>{comment})
+        |(?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)
+        |(?P<newline>\n)
+        |(?P<ws>[^\S\n]+)
+        |(?P<tok>[A-Za-z_$][\w$]*|\d[\w.]*|{_OPERATORS}|\S)
+        """,
+        re.S | re.X | re.M,
+    )
+    guard = re.compile(ambiguous, re.M) if ambiguous else None
+
+    def tokens(code: str) -> List[str]:
+        if guard is not None and guard.search(code):
+            raise Ambiguous("literal the lexer cannot delimit")
+        out: List[str] = []
+        for m in pattern.finditer(code):
+            kind = m.lastgroup
+            if kind == "ws":
+                continue
+            if kind == "comment":
+                # a comment spanning lines still ends the statement
+                multiline = "\n" in m.group()
+                if newline_significant and multiline and out and out[-1] != "\n":
+                    out.append("\n")
+                continue
+            if kind == "directive":
+                out += [m.group().strip(), "\n"]
+                continue
+            if kind == "newline":
+                if newline_significant and out and out[-1] != "\n":
+                    out.append("\n")
+                continue
+            tok = m.group()
+            if kind == "tok" and regex_after is not None and tok == "/":
+                spaced = (
+                    spaced_regex
+                    and code[m.start() - 1 : m.start()] in (" ", "\t")
+                    and not code[m.end() : m.end() + 1].isspace()
+                )
+                if spaced or _regex_possible(out[-1] if out else None, regex_after):
+                    raise Ambiguous("possible regex literal")
+            out.append(tok)
+        if out and out[-1] == "\n":
+            out.pop()
+        return out
+
+    return tokens
+
+
+_C_COMMENT = r"//[^\n]*|/\*.*?\*/"
+# Ruby literals whose body may contain "#": %-literals, heredocs, ?# characters.
+_RB_AMBIGUOUS = r"%[qQwWiIrsx]?[(\[{<|!/^]|<<[~-]?(['\"]?)[A-Za-z_]\w*\1|\?\#"
+
+CANONICALIZERS: Dict[str, Canonicalizer] = {
+    "python": Canonicalizer("py1", _python_tokens),
+    "ruby": Canonicalizer(
+        "rb2",
+        _lexer(
+            r"\#[^\n]*|^=begin.*?^=end",
+            newline_significant=True,
+            regex_after=_RB_REGEX_AFTER,
+            spaced_regex=True,
+            ambiguous=_RB_AMBIGUOUS,
+        ),
+    ),
+    # "#[" opens a PHP 8 attribute, not a comment
+    "php": Canonicalizer("php2", _lexer(rf"{_C_COMMENT}|\#(?!\[)[^\n]*")),
+}
+for _lang in ("java", "rust"):
+    CANONICALIZERS[_lang] = Canonicalizer("c2", _lexer(_C_COMMENT))
+for _lang in ("c", "cpp"):
+    CANONICALIZERS[_lang] = Canonicalizer("c2", _lexer(_C_COMMENT, directives=True))
+# Automatic semicolon insertion makes line breaks significant in these.
+for _lang in ("javascript", "typescript"):
+    CANONICALIZERS[_lang] = Canonicalizer(
+        "js2",
+        _lexer(_C_COMMENT, newline_significant=True, regex_after=_JS_REGEX_AFTER),
+    )
+CANONICALIZERS["go"] = Canonicalizer(
+    "go2", _lexer(_C_COMMENT, newline_significant=True)
+)
+
+
+def register(language: str, canonicalizer: Canonicalizer):
+    CANONICALIZERS[language] = canonicalizer
+
+
+def canonicalize(language: str, code: str) -> Optional[tuple]:
+    """Return (tag, canonical text), or None when no canonicalizer applies."""
+    canon = CANONICALIZERS.get(language)
+    if canon is None:
+        return None
+    try:
+        toks = canon.tokens(code)
+    except (tokenize.TokenError, IndentationError, SyntaxError, Ambiguous):
+        return None
+    return canon.tag, " ".join(toks)
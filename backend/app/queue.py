@@ -1,8 +1,36 @@
 from celery import Celery
+from kombu import Queue
 from .config import settings
 
+QUEUE_INTERACTIVE_SMALL = "reviews.interactive.small"
+QUEUE_INTERACTIVE_LARGE = "reviews.interactive.large"
+QUEUE_BATCH = "reviews.batch"
+# Broker priorities run 0 (served first) .. PRIORITY_STEPS - 1.
+PRIORITY_STEPS = 10
+
 celery = Celery(
     "reviews", broker=settings.CELERY_BROKER_URL, backend=settings.CELERY_RESULT_BACKEND
 )
 celery.conf.task_acks_late = True
 celery.conf.worker_concurrency = 4
+
+# A worker started without -Q consumes every queue; dedicate workers to
+# reviews.interactive.small to keep interactive latency flat under bulk load.
+celery.conf.task_queues = [
+    Queue(QUEUE_INTERACTIVE_SMALL),
+    Queue(QUEUE_INTERACTIVE_LARGE),
+    Queue(QUEUE_BATCH),
+]
+celery.conf.task_default_queue = QUEUE_INTERACTIVE_SMALL
+celery.conf.broker_transport_options = {
+    "priority_steps": list(range(PRIORITY_STEPS)),
+    "sep": ":",
+    "queue_order_strategy": "priority",
+}
+
+if settings.WORKER_MODE == "async":
+    # Threads only park on futures; the reviews themselves run concurrently
+    # on one event loop per process (see worker.process_review).
+    celery.conf.worker_pool = "threads"
+    celery.conf.worker_concurrency = settings.WORKER_ASYNC_CONCURRENCY
+    celery.conf.worker_prefetch_multiplier = 1
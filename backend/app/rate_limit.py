@@ -1,15 +1,73 @@
-from typing import Optional
-from redis.asyncio import Redis, from_url
+from typing import List, NamedTuple, Optional, Tuple
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
 from .config import settings
+from . import redis_conn
+from .metrics import REJECTED
 import time
 
 _rate: Optional[Redis] = None
+_rate_url: Optional[str] = None
+_script: Optional[AsyncScript] = None
+
+# GCRA over several limits at once, decided atomically in one round trip.
+# KEYS[i] holds the theoretical arrival time (ms) for limit i.
+# ARGV = now_ms, then (limit, period_ms) per key.
+# Returns {allowed, remaining, reset_ms, retry_after_ms, tightest_index}.
+_GCRA = """
+local now = tonumber(ARGV[1])
+local n = #KEYS
+local tats, allowed = {}, 1
+local retry_ms = 0
+for i = 1, n do
+  local limit = tonumber(ARGV[2 * i])
+  local period = tonumber(ARGV[2 * i + 1])
+  local interval = period / limit
+  local tat = tonumber(redis.call('GET', KEYS[i]) or now)
+  if tat < now then tat = now end
+  local allow_at = tat + interval - period
+  if now < allow_at then
+    allowed = 0
+    retry_ms = math.max(retry_ms, allow_at - now)
+  end
+  tats[i] = tat
+end
+local remaining, reset_ms, tightest = -1, 0, 1
+for i = 1, n do
+  local limit = tonumber(ARGV[2 * i])
+  local period = tonumber(ARGV[2 * i + 1])
+  local interval = period / limit
+  local tat = tats[i]
+  if allowed == 1 then
+    tat = tat + interval
+    redis.call('SET', KEYS[i], string.format('%.3f', tat), 'PX', math.ceil(tat - now))
+  end
+  local rem = math.floor((period - (tat - now)) / interval)
+  if remaining < 0 or rem < remaining then
+    remaining, tightest = rem, i
+  end
+  reset_ms = math.max(reset_ms, tat - now)
+end
+return {
+  allowed, math.max(remaining, 0), math.ceil(reset_ms), math.ceil(retry_ms),
+  tightest
+}
+"""
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_seconds: int
+    retry_after_seconds: int
 
 
 async def init_rate_limiter(url: Optional[str] = None):
-    global _rate
+    global _rate, _rate_url
     if _rate is None:
-        _rate = from_url(url or settings.RATE_LIMIT_REDIS_URL, decode_responses=True)
+        _rate_url = url or settings.RATE_LIMIT_REDIS_URL
+        _rate = redis_conn.acquire(_rate_url)
     return _rate
 
 
@@ -22,23 +80,76 @@ async def get_rate_redis() -> Redis:
 
 
 async def close_rate_limiter():
-    global _rate
+    global _rate, _script
     if _rate is not None:
-        await _rate.aclose()
         _rate = None
+        _script = None
+        await redis_conn.release(_rate_url)
+
+
+def _limits(per_hour: Optional[int] = None) -> List[Tuple[int, int]]:
+    """(limit, period_seconds) pairs that are switched on."""
+    limits = [
+        (int(settings.RATE_LIMIT_PER_MINUTE), 60),
+        (per_hour or int(settings.RATE_LIMIT_PER_HOUR), 3600),
+    ]
+    return [(limit, period) for limit, period in limits if limit > 0]
+
 
+def rate_limit_headers(result: RateLimitResult) -> dict:
+    headers = {
+        "X-RateLimit-Limit": str(result.limit),
+        "X-RateLimit-Remaining": str(result.remaining),
+        "X-RateLimit-Reset": str(result.reset_seconds),
+    }
+    if not result.allowed:
+        headers["Retry-After"] = str(result.retry_after_seconds)
+    return headers
 
-async def limit_check(ip: str, per_hour: Optional[int] = None):
-    r = await get_rate_redis()
-    limit = per_hour or int(settings.RATE_LIMIT_PER_HOUR)
-    bucket = int(time.time() // 3600)
-    key = f"ratelimit:{ip}:{bucket}"
-    cnt = await r.incr(key)
-    if cnt == 1:
-        await r.expire(key, 3600)
-    if cnt > limit:
+
+def prepare(ip: str, per_hour: Optional[int] = None) -> Tuple[list, list, list]:
+    """Keys, script args and the active limits for one check."""
+    limits = _limits(per_hour)
+    keys = [f"ratelimit:{ip}:{period}" for _, period in limits]
+    args: list = [int(time.time() * 1000)]
+    for limit, period in limits:
+        args += [limit, period * 1000]
+    return keys, args, limits
+
+
+def interpret(raw: list, limits: list) -> RateLimitResult:
+    """Turn the script reply into a result, raising 429 when denied."""
+    allowed, remaining, reset_ms, retry_ms, tightest = raw
+    limit, period = limits[tightest - 1]
+    result = RateLimitResult(
+        allowed=bool(allowed),
+        limit=limit,
+        remaining=remaining,
+        reset_seconds=-(-reset_ms // 1000),
+        retry_after_seconds=max(1, -(-retry_ms // 1000)),
+    )
+    if not result.allowed:
         from fastapi import HTTPException
 
+        REJECTED.labels("rate_limit").inc()
+        unit = "minute" if period == 60 else "hour"
         raise HTTPException(
-            status_code=429, detail=f"Rate limit exceeded ({limit} reviews/hour)"
+            status_code=429,
+            detail=f"Rate limit exceeded ({limit} reviews/{unit})",
+            headers=rate_limit_headers(result),
         )
+    return result
+
+
+async def get_script() -> AsyncScript:
+    global _script
+    if _script is None:
+        r = await get_rate_redis()
+        _script = r.register_script(_GCRA)
+    return _script
+
+
+async def limit_check(ip: str, per_hour: Optional[int] = None) -> RateLimitResult:
+    script = await get_script()
+    keys, args, limits = prepare(ip, per_hour)
+    return interpret(await script(keys=keys, args=args), limits)
@@ -0,0 +1,36 @@
+from typing import Dict, Tuple
+from redis.asyncio import BlockingConnectionPool, Redis
+from .config import settings
+from .metrics import TimedRedis
+
+# One client (and connection pool) per Redis URL, shared by the cache, rate
+# limiter and event hub; reference-counted so each module can close its use.
+_clients: Dict[str, Tuple[Redis, int]] = {}
+
+
+def acquire(url: str) -> Redis:
+    client, refs = _clients.get(url, (None, 0))
+    if client is None:
+        # Blocking pool: callers wait for a free connection instead of failing
+        # once REDIS_MAX_CONNECTIONS are checked out.
+        pool = BlockingConnectionPool.from_url(
+            url,
+            decode_responses=True,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT_SECONDS,
+        )
+        client = TimedRedis(connection_pool=pool)
+    _clients[url] = (client, refs + 1)
+    return client
+
+
+async def release(url: str):
+    client, refs = _clients.get(url, (None, 0))
+    if client is None:
+        return
+    if refs > 1:
+        _clients[url] = (client, refs - 1)
+        return
+    del _clients[url]
+    await client.aclose()
+    await client.connection_pool.disconnect()
@@ -0,0 +1,87 @@
+from datetime import datetime, timezone
+from typing import Optional, Union
+from . import db
+
+MAX_ISSUE_TITLES = 20
+
+
+def _to_naive_utc(ts: datetime) -> datetime:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def hour_of(ts: Union[str, datetime]) -> datetime:
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    return _to_naive_utc(ts).replace(minute=0, second=0, microsecond=0)
+
+
+def _issue_key(title: str) -> str:
+    # Mongo field names cannot contain "." or start with "$".
+    return title.replace(".", "．").replace("$", "＄")
+
+
+def issue_title(key: str) -> str:
+    return key.replace("．", ".").replace("＄", "$")
+
+
+async def record_review(
+    language: str, created_at: Union[str, datetime], review: Optional[dict]
+):
+    hour = hour_of(created_at)
+    inc: dict = {"count": 1}
+
+    score = (review or {}).get("score")
+    if isinstance(score, int):
+        inc["scored"] = 1
+        inc["score_sum"] = score
+        inc[f"hist.{score}"] = 1
+
+    for it in ((review or {}).get("issues") or [])[:MAX_ISSUE_TITLES]:
+        title = it.get("title") if isinstance(it, dict) else None
+        if title:
+            key = f"issues.{_issue_key(title[:200])}"
+            inc[key] = inc.get(key, 0) + 1
+
+    await db.stats_hourly.update_one(
+        {"_id": f"{language}:{hour.isoformat()}"},
+        {"$inc": inc, "$setOnInsert": {"language": language, "hour": hour}},
+        upsert=True,
+    )
+
+
+async def rebuild_rollups():
+    """One-off backfill of stats_hourly from completed submissions."""
+    await db.stats_hourly.delete_many({})
+    cur = db.submissions.aggregate(
+        [
+            {"$match": {"status": "completed"}},
+            {
+                "$lookup": {
+                    "from": "reviews",
+                    "localField": "review_id",
+                    "foreignField": "_id",
+                    "pipeline": [{"$project": {"score": 1, "issues.title": 1}}],
+                    "as": "review",
+                }
+            },
+            {"$unwind": "$review"},
+            {"$project": {"language": 1, "created_at": 1, "review": 1}},
+        ]
+    )
+    async for doc in cur:
+        await record_review(doc["language"], doc["created_at"], doc["review"])
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    async def _main():
+        await db.init_db()
+        try:
+            await rebuild_rollups()
+        finally:
+            await db.close_db()
+
+    asyncio.run(_main())
@@ -1,78 +1,160 @@
-from fastapi import APIRouter, Request, Query, Response, status
+from fastapi import APIRouter, HTTPException, Request, Query, Response, status
 from datetime import datetime
 from bson import ObjectId
-from typing import Optional
+from typing import Optional, Tuple
 import asyncio
+import base64
 import json
 
 from sse_starlette.sse import EventSourceResponse
 
 from ..schemas import ReviewCreate, ReviewOut, ReviewAccepted
-from ..rate_limit import limit_check
-from ..queue import celery
-from ..cache import code_hash as compute_hash, cache_get_review_id
+from ..rate_limit import rate_limit_headers
+from ..admission import admit, check_capacity, estimate_wait_ms
+from ..routing import enqueue, peek_route
+from ..cache import (
+    code_hash as compute_hash,
+    cache_get_review_id,
+    inflight_acquire,
+    inflight_leader,
+    inflight_release,
+    cache_get_review_payload,
+    cache_set_review_payloads,
+)
+from ..config import settings
+from ..tokens import over_budget
+from ..blobs import code_of, store_code
+from ..fastjson import dumps, review_out
+from ..metrics import CACHE_LOOKUPS
+from ..tracing import traced
+from ..events import listen, jsonable_review
+from ..rollups import record_review
 from .. import db
 
 router = APIRouter(prefix="/api/reviews", tags=["reviews"])
 
 
-async def get_reviews_for_submission(id: str) -> ReviewOut:
-    submission = await db.submissions.find_one({"_id": ObjectId(id)})
+_REVIEW_FIELDS = {
+    "_id": 0,
+    "score": 1,
+    "issues": 1,
+    "security": 1,
+    "performance": 1,
+    "suggestions": 1,
+    "schema_version": 1,
+}
+
+# Submissions written before code blobs still embed their source.
+_NO_CODE = {"code": 0}
+
+
+def _encode_cursor(doc: dict) -> str:
+    raw = json.dumps([doc["created_at"], str(doc["_id"])]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, ObjectId]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, oid = json.loads(raw)
+        return created_at, ObjectId(oid)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def _find_submission(oid: ObjectId) -> Optional[dict]:
+    submission = await db.submissions.find_one({"_id": oid}, _NO_CODE)
+    if (
+        submission
+        and submission.get("leader_id")
+        and submission["status"] in ("pending", "in_progress")
+    ):
+        leader_id = str(submission["leader_id"])
+        if await inflight_leader(submission["code_hash"]) != leader_id:
+            # The key no longer names our leader: settle unless it is still queued.
+            await _settle_follower(submission, leader_id)
+            submission = await db.submissions.find_one({"_id": oid}, _NO_CODE)
+    return submission
+
+
+async def _load_docs(id: str) -> Tuple[dict, Optional[dict]]:
+    submission = await _find_submission(ObjectId(id))
     if not submission:
         raise ValueError("Not found")
 
-    score = issues = security = performance = suggestions = None
-
+    review = None
     if submission.get("review_id"):
-        review = await db.reviews.find_one({"_id": submission["review_id"]})
-        if review:
-            score = review.get("score")
-            issues = review.get("issues", [])
-            security = review.get("security", [])
-            performance = review.get("performance", [])
-            suggestions = review.get("suggestions", [])
-
-    return ReviewOut(
-        id=str(submission["_id"]),
-        status=submission["status"],
-        created_at=submission["created_at"],
-        updated_at=submission["updated_at"],
-        language=submission["language"],
-        score=score,
-        issues=issues,
-        security=security,
-        performance=performance,
-        suggestions=suggestions,
-        error=submission.get("error"),
-    )
+        review = await db.reviews.find_one(
+            {"_id": submission["review_id"]}, _REVIEW_FIELDS
+        )
+    return submission, review
+
+
+async def get_reviews_for_submission(id: str) -> ReviewOut:
+    return ReviewOut.from_docs(*await _load_docs(id))
 
 
 @router.post("", response_model=ReviewAccepted, status_code=status.HTTP_202_ACCEPTED)
+@traced("submit_review")
 async def submit_review(payload: ReviewCreate, request: Request, response: Response):
     ip = request.client.host
-    await limit_check(ip)
+
+    base_id = None
+    if payload.base_submission_id:
+        if not ObjectId.is_valid(payload.base_submission_id):
+            raise HTTPException(status_code=400, detail="Invalid base_submission_id")
+        base_id = ObjectId(payload.base_submission_id)
+
+    # Over-budget code can only be reviewed in chunks.
+    if not settings.LARGE_FILE_ENABLED and over_budget(payload.language, payload.code):
+        budget = settings.LLM_INPUT_TOKEN_BUDGET
+        raise HTTPException(
+            status_code=413, detail=f"Code exceeds the {budget}-token review budget"
+        )
 
     now = datetime.utcnow().isoformat()
     code_hash = compute_hash(payload.language, payload.code)
 
-    cached_review_id = await cache_get_review_id(code_hash)
+    quota, cached_review_id = await admit(ip, code_hash)
+    response.headers.update(rate_limit_headers(quota))
+    CACHE_LOOKUPS.labels("review", "hit" if cached_review_id else "miss").inc()
     if cached_review_id:
+        review = await _scored_review(ObjectId(cached_review_id))
         doc = {
-            "code": payload.code,
+            **await store_code(payload.code),
             "language": payload.language,
             "status": "completed",
             "created_at": now,
             "updated_at": now,
             "ip": ip,
             "review_id": ObjectId(cached_review_id),
+            "score": (review or {}).get("score"),
             "error": None,
             "code_hash": code_hash,
         }
         res = await db.submissions.insert_one(doc)
-        return ReviewAccepted(id=str(res.inserted_id), status="completed")
+        await record_review(payload.language, now, review)
+        return ReviewAccepted(
+            id=str(res.inserted_id), status="completed", estimated_wait_ms=0
+        )
+
+    sub_oid = ObjectId()
+    submission_id = str(sub_oid)
+    leader_id = await inflight_acquire(code_hash, submission_id)
+    route = await peek_route(ip, payload.code, payload.priority)
+    if leader_id:
+        # Followers need no worker of their own, so they are never shed.
+        wait_ms = await estimate_wait_ms(route.queue, route.priority)
+    else:
+        try:
+            wait_ms = await check_capacity(route.queue, route.priority)
+        except HTTPException:
+            await inflight_release(code_hash, submission_id)
+            raise
 
     submission = {
-        "code": payload.code,
+        "_id": sub_oid,
+        **await store_code(payload.code),
         "language": payload.language,
         "status": "pending",
         "created_at": now,
@@ -82,23 +164,147 @@ async def submit_review(payload: ReviewCreate, request: Request, response: Respo
         "error": None,
         "code_hash": code_hash,
     }
-    result = await db.submissions.insert_one(submission)
-    submission_id = str(result.inserted_id)
-
-    celery.send_task("process_review", args=[submission_id])
+    if base_id is not None:
+        submission["base_submission_id"] = base_id
+    if leader_id:
+        # Identical code is already being reviewed: ride along on that result.
+        submission["leader_id"] = ObjectId(leader_id)
+    try:
+        await db.submissions.insert_one(submission)
+        if not leader_id:
+            await enqueue(submission_id, ip, payload.code, payload.priority)
+    except Exception:
+        if not leader_id:
+            # Free the slot so followers do not wait on a review that never runs.
+            await inflight_release(code_hash, submission_id)
+            await db.submissions.update_one(
+                {"_id": sub_oid, "status": "pending"},
+                {
+                    "$set": {
+                        "status": "failed",
+                        "error": "Could not enqueue review",
+                        "updated_at": now,
+                    }
+                },
+            )
+        raise
 
     response.headers["Location"] = f"/api/reviews/{submission_id}"
 
-    return ReviewAccepted(id=submission_id, status="pending")
+    if not leader_id:
+        return ReviewAccepted(
+            id=submission_id, status="pending", estimated_wait_ms=wait_ms
+        )
+
+    status_val = await _settle_follower(
+        submission, leader_id, payload.code, payload.priority
+    )
+    if status_val == "completed":
+        wait_ms = 0
+    return ReviewAccepted(
+        id=submission_id, status=status_val, estimated_wait_ms=wait_ms
+    )
+
+
+async def _scored_review(review_id: ObjectId) -> Optional[dict]:
+    """What a reused review contributes to its submission and the rollups."""
+    return await db.reviews.find_one(
+        {"_id": review_id}, {"score": 1, "issues.title": 1}
+    )
+
+
+async def _settle_follower(
+    submission: dict,
+    leader_id: str,
+    code: Optional[str] = None,
+    priority: str = "interactive",
+) -> str:
+    """Close the race with a leader that finished before we were inserted.
+
+    The worker releases the in-flight key before fanning out, so while the key
+    still names our leader its fan-out is guaranteed to see this follower.
+    Followers of a leader that failed or vanished are reviewed on their own;
+    a leader still queued keeps its followers even once its key expired.
+    """
+    code_hash = submission["code_hash"]
+    if await inflight_leader(code_hash) == leader_id:
+        return "pending"
+
+    review_id = await cache_get_review_id(code_hash)
+    if not review_id:
+        leader = await db.submissions.find_one(
+            {"_id": ObjectId(leader_id)}, {"status": 1, "review_id": 1}
+        )
+        if leader and leader["status"] in ("pending", "in_progress"):
+            # Only the key expired: the leader's fan-out will still reach us.
+            return "pending"
+        if leader and leader["status"] == "completed":
+            review_id = str(leader["review_id"])
+    if review_id:
+        review = await _scored_review(ObjectId(review_id))
+        res = await db.submissions.update_one(
+            {"_id": submission["_id"], "status": {"$nin": ["completed", "failed"]}},
+            {
+                "$set": {
+                    "status": "completed",
+                    "review_id": ObjectId(review_id),
+                    "score": (review or {}).get("score"),
+                    "updated_at": submission["created_at"],
+                }
+            },
+        )
+        if res.modified_count:
+            await record_review(
+                submission["language"], submission["created_at"], review
+            )
+        return "completed"
+
+    # The leader failed or expired: review this one on its own, exactly once.
+    res = await db.submissions.update_one(
+        {
+            "_id": submission["_id"],
+            "leader_id": ObjectId(leader_id),
+            "status": {"$nin": ["completed", "failed"]},
+        },
+        {"$set": {"status": "pending"}, "$unset": {"leader_id": ""}},
+    )
+    if res.modified_count:
+        if code is None:
+            code = await code_of(
+                await db.submissions.find_one(
+                    {"_id": submission["_id"]}, {"code": 1, "code_blob": 1}
+                )
+            )
+        await enqueue(str(submission["_id"]), submission["ip"], code, priority)
+    return "pending"
 
 
 @router.get("/{id}", response_model=ReviewOut)
 async def get_review(id: str):
-    return await get_reviews_for_submission(id)
+    # Terminal reviews never change: serve the serialized body as-is.
+    cached = await cache_get_review_payload(id)
+    CACHE_LOOKUPS.labels("payload", "miss" if cached is None else "hit").inc()
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+
+    if settings.FAST_JSON_ENABLED:
+        submission, review = await _load_docs(id)
+        body = dumps(review_out(submission, review))
+        status_val = submission["status"]
+    else:
+        out = await get_reviews_for_submission(id)
+        if out.status not in ("completed", "failed"):
+            return out
+        body = out.model_dump_json()
+        status_val = out.status
+    if status_val in ("completed", "failed"):
+        await cache_set_review_payloads({id: body})
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("", response_model=list[ReviewOut])
 async def list_reviews(
+    response: Response,
     language: Optional[str] = None,
     status: Optional[str] = None,
     min_score: Optional[int] = Query(None, ge=1, le=10),
@@ -107,6 +313,7 @@ async def list_reviews(
     end_date: Optional[str] = None,
     page: int = 1,
     page_size: int = 20,
+    cursor: Optional[str] = None,
 ):
     q = {}
     if language:
@@ -120,37 +327,74 @@ async def list_reviews(
         if end_date:
             created["$lte"] = end_date
         q["created_at"] = created
+    if cursor:
+        # Keyset on (created_at, _id): constant cost at any depth.
+        after_created, after_id = _decode_cursor(cursor)
+        q["$or"] = [
+            {"created_at": {"$lt": after_created}},
+            {"created_at": after_created, "_id": {"$lt": after_id}},
+        ]
 
-    cursor = (
-        db.submissions.find(q)
-        .sort("created_at", -1)
-        .skip((page - 1) * page_size)
-        .limit(page_size)
-    )
-    submissions = await cursor.to_list(length=page_size)
+    # The worker copies the score onto the submission, so the filter is served
+    # by the sub_lang_score_created index and the join only runs for the page.
+    score: dict = {}
+    if min_score is not None:
+        score["$gte"] = min_score
+    if max_score is not None:
+        score["$lte"] = max_score
+    if score:
+        q["score"] = score
 
-    reviews = [
-        await get_reviews_for_submission(str(submission["_id"]))
-        for submission in submissions
+    pipeline: list = [{"$match": q}, {"$sort": {"created_at": -1, "_id": -1}}]
+    if not cursor:
+        pipeline.append({"$skip": (page - 1) * page_size})
+    pipeline += [
+        {"$limit": page_size},
+        {
+            "$lookup": {
+                "from": "reviews",
+                "localField": "review_id",
+                "foreignField": "_id",
+                "pipeline": [{"$project": _REVIEW_FIELDS}],
+                "as": "review",
+            }
+        },
+        {"$project": _NO_CODE},
     ]
 
-    if min_score is not None or max_score is not None:
-        reviews = [
-            review
-            for review in reviews
-            if (
-                review.score is not None
-                and (min_score is None or review.score >= min_score)
-                and (max_score is None or review.score <= max_score)
-            )
-        ]
-    return reviews
+    docs = await db.submissions.aggregate(pipeline).to_list(length=page_size)
+    headers = {}
+    if len(docs) == page_size:
+        headers["X-Next-Cursor"] = _encode_cursor(docs[-1])
+    if settings.FAST_JSON_ENABLED:
+        body = dumps(
+            [review_out(d, d["review"][0] if d["review"] else None) for d in docs]
+        )
+        return Response(content=body, media_type="application/json", headers=headers)
+    response.headers.update(headers)
+    return [
+        ReviewOut.from_docs(doc, doc["review"][0] if doc["review"] else None)
+        for doc in docs
+    ]
+
+
+def _encode_event(payload: dict) -> str:
+    if settings.FAST_JSON_ENABLED:
+        return dumps(payload).decode()
+    return json.dumps(payload)
+
+
+async def _done_payload(sub: dict) -> dict:
+    payload = {"status": sub["status"]}
+    if sub.get("review_id"):
+        review = await db.reviews.find_one({"_id": sub["review_id"]})
+        payload["review"] = jsonable_review(review) if review else None
+    return payload
 
 
 @router.get("/{id}/stream")
 async def stream_review(
     id: str,
-    interval_ms: int = Query(1000, ge=10, le=60000),
     ping: int = Query(15000, ge=0, le=60000),
 ):
     async def event_gen():
@@ -160,28 +404,35 @@ async def stream_review(
             yield {"event": "error", "data": "invalid_id"}
             return
 
-        while True:
-            sub = await db.submissions.find_one({"_id": oid})
+        # Subscribe before the initial read so a transition between the two
+        # is not lost; afterwards Mongo is only touched on the slow resync.
+        async with listen(id) as inbox:
+            sub = await _find_submission(oid)
             if not sub:
                 yield {"event": "error", "data": "not_found"}
                 return
+            state = sub
 
-            status_val = sub.get("status", "pending")
-            yield {"event": "status", "data": status_val}
-
-            if status_val in ("completed", "failed"):
-                payload = {"status": status_val}
-                if sub.get("review_id"):
-                    review = await db.reviews.find_one({"_id": sub["review_id"]})
-                    if review:
-                        review["_id"] = str(review["_id"])
-                        if "submission_id" in review:
-                            review["submission_id"] = str(review["submission_id"])
-                    payload["review"] = review
-                yield {"event": "done", "data": json.dumps(payload)}
-                return
+            while True:
+                status_val = state.get("status", "pending")
+                yield {"event": "status", "data": status_val}
+
+                if status_val in ("completed", "failed"):
+                    payload = await _done_payload(sub) if sub is not None else state
+                    yield {"event": "done", "data": _encode_event(payload)}
+                    return
 
-            await asyncio.sleep(interval_ms / 1000.0)
+                try:
+                    state = await asyncio.wait_for(
+                        inbox.get(), timeout=settings.SSE_RESYNC_SECONDS
+                    )
+                    sub = None
+                except asyncio.TimeoutError:
+                    sub = await _find_submission(oid)
+                    if not sub:
+                        yield {"event": "error", "data": "not_found"}
+                        return
+                    state = sub
 
     return EventSourceResponse(
         event_gen(),
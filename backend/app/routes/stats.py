@@ -1,104 +1,117 @@
-from fastapi import APIRouter, Query
-from datetime import datetime
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from datetime import datetime, timedelta
+from typing import Literal, Optional
 from .. import db
+from ..rollups import hour_of, issue_title
+from ..schemas import StatsOut, StatsPoint
 
 router = APIRouter(prefix="/api/stats", tags=["stats"])
 
 
-@router.get("")
-async def get_stats(
-    language: Optional[str] = Query(None),
-    start: Optional[str] = Query(None),
-    end: Optional[str] = Query(None),
-):
-    match: dict = {"status": "completed"}
+def _parse_ts(value: str, name: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name} timestamp")
+
+
+def _rollup_match(
+    language: Optional[str], start: Optional[str], end: Optional[str]
+) -> dict:
+    # Rollups are hourly, so ranges widen to the whole hours they touch.
+    match: dict = {}
     if language:
         match["language"] = language
+    hour: dict = {}
+    if start:
+        hour["$gte"] = hour_of(_parse_ts(start, "start"))
+    if end:
+        # round up: an end of 10:30 still covers the 10:00 bucket
+        last = _parse_ts(end, "end") - timedelta(microseconds=1)
+        hour["$lt"] = hour_of(last) + timedelta(hours=1)
+    if hour:
+        match["hour"] = hour
+    return match
 
-    date_match = None
-    if start or end:
-        exprs = []
-        if start:
-            try:
-                start_dt = datetime.fromisoformat(start)
-            except Exception:
-                start_dt = start
-            exprs.append({"$gte": [{"$toDate": "$created_at"}, start_dt]})
-        if end:
-            try:
-                end_dt = datetime.fromisoformat(end)
-            except Exception:
-                end_dt = end
-            exprs.append({"$lt": [{"$toDate": "$created_at"}, end_dt]})
-        if exprs:
-            date_match = {"$expr": {"$and": exprs}}
 
-    pipeline = [
-        {"$match": match},
-    ]
+def _avg(score_sum: int, scored: int) -> Optional[float]:
+    return round(score_sum / scored, 2) if scored else None
 
-    if date_match:
-        pipeline.append({"$match": date_match})
 
-    pipeline += [
-        {
-            "$lookup": {
-                "from": "reviews",
-                "localField": "review_id",
-                "foreignField": "_id",
-                "as": "review",
-            }
-        },
-        {"$unwind": "$review"},
+@router.get("", response_model=StatsOut)
+async def get_stats(
+    language: Optional[str] = Query(None),
+    start: Optional[str] = Query(None),
+    end: Optional[str] = Query(None),
+):
+    pipeline = [
+        {"$match": _rollup_match(language, start, end)},
         {
             "$facet": {
                 "stats": [
                     {
                         "$group": {
                             "_id": None,
-                            "total": {"$sum": 1},
-                            "avg_score": {"$avg": "$review.score"},
-                        }
-                    },
-                    {
-                        "$project": {
-                            "_id": 0,
-                            "total": 1,
-                            "avg_score": {
-                                "$cond": [
-                                    {"$ne": ["$avg_score", None]},
-                                    {"$round": ["$avg_score", 2]},
-                                    None,
-                                ]
-                            },
+                            "total": {"$sum": "$count"},
+                            "scored": {"$sum": "$scored"},
+                            "score_sum": {"$sum": "$score_sum"},
                         }
-                    },
+                    }
                 ],
                 "issues": [
-                    {
-                        "$unwind": {
-                            "path": "$review.issues",
-                            "preserveNullAndEmptyArrays": False,
-                        }
-                    },
-                    {"$group": {"_id": "$review.issues.title", "count": {"$sum": 1}}},
+                    {"$project": {"issues": {"$objectToArray": "$issues"}}},
+                    {"$unwind": "$issues"},
+                    {"$group": {"_id": "$issues.k", "count": {"$sum": "$issues.v"}}},
                     {"$sort": {"count": -1}},
                     {"$limit": 100},
-                    {"$project": {"_id": 0, "title": "$_id"}},
                 ],
             }
         },
+    ]
+
+    docs = await db.stats_hourly.aggregate(pipeline).to_list(length=1)
+    facet = docs[0] if docs else {"stats": [], "issues": []}
+    stats = facet["stats"][0] if facet["stats"] else {}
+    return {
+        "total": stats.get("total", 0),
+        "avg_score": _avg(stats.get("score_sum", 0), stats.get("scored", 0)),
+        "common_issues": [issue_title(it["_id"]) for it in facet["issues"]],
+    }
+
+
+@router.get("/timeseries", response_model=list[StatsPoint])
+async def get_stats_timeseries(
+    language: Optional[str] = Query(None),
+    start: Optional[str] = Query(None),
+    end: Optional[str] = Query(None),
+    bucket: Literal["hour", "day", "week", "month"] = Query("day"),
+):
+    pipeline = [
+        {"$match": _rollup_match(language, start, end)},
         {
-            "$project": {
-                "total": {"$ifNull": [{"$arrayElemAt": ["$stats.total", 0]}, 0]},
-                "avg_score": {"$arrayElemAt": ["$stats.avg_score", 0]},
-                "common_issues": "$issues.title",
+            "$group": {
+                "_id": {"$dateTrunc": {"date": "$hour", "unit": bucket}},
+                "total": {"$sum": "$count"},
+                "scored": {"$sum": "$scored"},
+                "score_sum": {"$sum": "$score_sum"},
+                "hists": {"$push": "$hist"},
             }
         },
+        {"$sort": {"_id": 1}},
     ]
 
-    cur = db.submissions.aggregate(pipeline)
-    docs = await cur.to_list(length=1)
-    out = docs[0] if docs else {"total": 0, "avg_score": None, "common_issues": []}
+    out = []
+    async for doc in db.stats_hourly.aggregate(pipeline):
+        histogram: dict = {}
+        for hist in doc["hists"]:
+            for score, n in (hist or {}).items():
+                histogram[score] = histogram.get(score, 0) + n
+        out.append(
+            {
+                "bucket": doc["_id"],
+                "total": doc["total"],
+                "avg_score": _avg(doc["score_sum"], doc["scored"]),
+                "histogram": histogram,
+            }
+        )
     return out
@@ -0,0 +1,82 @@
+from typing import NamedTuple
+from .batching import estimate_tokens
+from .cache import get_cache
+from .config import settings
+from .tracing import inject, span
+from .queue import (
+    celery,
+    PRIORITY_STEPS,
+    QUEUE_BATCH,
+    QUEUE_INTERACTIVE_LARGE,
+    QUEUE_INTERACTIVE_SMALL,
+)
+
+# INCR the client's in-flight count and keep the key from outliving a crashed
+# worker that never released it.
+_ACQUIRE = """
+local n = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return n
+"""
+
+_RELEASE = """
+local n = redis.call('DECR', KEYS[1])
+if n <= 0 then redis.call('DEL', KEYS[1]) end
+return n
+"""
+
+
+class Route(NamedTuple):
+    queue: str
+    priority: int
+
+
+def _fair_key(client: str) -> str:
+    return f"{settings.CACHE_PREFIX}fair:{client}"
+
+
+def route_for(code: str, priority: str, inflight: int) -> Route:
+    """Pick the queue by cost and class, and the broker priority by fairness.
+
+    Each job a client already has in flight pushes its next one a step back,
+    so a bulk submitter interleaves with everyone else instead of blocking
+    them. Past FAIR_MAX_INTERACTIVE_INFLIGHT its work is treated as batch.
+    """
+    if priority == "batch" or inflight > settings.FAIR_MAX_INTERACTIVE_INFLIGHT:
+        queue = QUEUE_BATCH
+    elif estimate_tokens(code) >= settings.QUEUE_LARGE_MIN_TOKENS:
+        queue = QUEUE_INTERACTIVE_LARGE
+    else:
+        queue = QUEUE_INTERACTIVE_SMALL
+    return Route(queue, min(max(inflight - 1, 0), PRIORITY_STEPS - 1))
+
+
+async def peek_route(client: str, code: str, priority: str) -> Route:
+    """The route `enqueue` would pick right now, without taking a slot."""
+    r = await get_cache()
+    inflight = await r.get(_fair_key(client))
+    return route_for(code, priority, int(inflight or 0) + 1)
+
+
+async def enqueue(submission_id: str, client: str, code: str, priority: str) -> Route:
+    r = await get_cache()
+    inflight = await r.eval(
+        _ACQUIRE, 1, _fair_key(client), settings.FAIR_INFLIGHT_TTL_SECONDS
+    )
+    route = route_for(code, priority, int(inflight))
+    with span("enqueue", queue=route.queue, priority=route.priority):
+        # traceparent rides in the message headers; the worker continues it
+        celery.send_task(
+            "process_review",
+            args=[submission_id],
+            kwargs={"client": client},
+            queue=route.queue,
+            priority=route.priority,
+            headers=inject(),
+        )
+    return route
+
+
+async def release(client: str):
+    r = await get_cache()
+    await r.eval(_RELEASE, 1, _fair_key(client))
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, field_validator
-from typing import List, Literal, Optional
+from pydantic import BaseModel, Field, ValidationInfo, field_validator
+from typing import Dict, List, Literal, Optional, get_args
 from datetime import datetime
 
 Language = Literal[
@@ -19,18 +19,141 @@ Language = Literal[
 class ReviewCreate(BaseModel):
     code: str = Field(min_length=1)
     language: Language
+    base_submission_id: Optional[str] = None
+    priority: Literal["interactive", "batch"] = "interactive"
 
 
 class ReviewAccepted(BaseModel):
     id: str
     status: Literal["pending", "in_progress", "completed"] = "pending"
+    estimated_wait_ms: Optional[int] = None
+
+
+# The categories the model is asked for, then the older short names that
+# stored reviews may still carry.
+Category = Literal[
+    "correctness",
+    "security",
+    "performance",
+    "readability",
+    "maintainability",
+    "testability",
+    "style",
+    "bug",
+    "perf",
+    "other",
+]
 
 
 class Issue(BaseModel):
     title: str
     detail: str
     severity: Literal["low", "med", "high"] = "med"
-    category: Literal["style", "bug", "security", "perf", "other"] = "other"
+    category: Category = "other"
+
+
+# Stored reviews stamped with this version already have the shape the
+# ReviewOut validators would produce, so reads can skip repairing them.
+# v2: model categories are kept instead of collapsing to "other".
+REVIEW_SCHEMA_VERSION = 2
+
+_SEVERITIES = frozenset(("low", "med", "high"))
+_CATEGORIES = frozenset(get_args(Category))
+
+
+class MalformedReview(ValueError):
+    """Model output that cannot be turned into a review."""
+
+
+def normalize_issues(v):
+    if v is None:
+        return v
+    out = []
+    for it in v:
+        if isinstance(it, dict):
+            title = it.get("title") or it.get("name") or it.get("summary")
+            detail = (
+                it.get("detail")
+                or it.get("description")
+                or it.get("message")
+                or str(it)
+            )
+            severity = it.get("severity")
+            category = it.get("category")
+            if isinstance(category, str):
+                category = category.lower()
+            out.append(
+                {
+                    "title": title or (detail[:80] if detail else "Issue"),
+                    "detail": detail or "No details provided.",
+                    "severity": severity if severity in _SEVERITIES else "med",
+                    "category": category if category in _CATEGORIES else "other",
+                }
+            )
+        elif isinstance(it, str):
+            out.append(
+                {"title": it[:80], "detail": it, "severity": "med", "category": "other"}
+            )
+    return out
+
+
+def ensure_list_of_str(v):
+    if v is None:
+        return v
+    if isinstance(v, str):
+        return [v]
+    if isinstance(v, list):
+        return [str(x) for x in v]
+    return [str(v)]
+
+
+def _score(v) -> Optional[int]:
+    if isinstance(v, str) and v.strip().isdigit():
+        v = int(v)
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    if isinstance(v, int) and not isinstance(v, bool) and 1 <= v <= 10:
+        return v
+    return None
+
+
+# Bookkeeping the service attaches to a stored review; never taken from the model.
+REVIEW_METADATA = (
+    "duration_ms",
+    "model",
+    "prompt_tokens",
+    "completion_tokens",
+    "max_tokens",
+    "batch_size",
+    "batch_usage",
+    "chunks",
+    "diff_changed_lines",
+    "base_submission_id",
+)
+
+
+def canonical_review(data: dict, require_score: bool = True, keep=()) -> dict:
+    """Model output with the read-side repairs applied once, version-stamped.
+
+    Raises MalformedReview for output that is not a review at all, so the
+    model call can be retried. Only the review fields and the `keep` keys
+    survive, so model output cannot add or override document fields.
+    """
+    if not isinstance(data, dict):
+        raise MalformedReview("review is not a JSON object")
+    score = _score(data.get("score"))
+    if score is None and require_score:
+        raise MalformedReview(f"invalid score: {data.get('score')!r}")
+    issues = data.get("issues") or []
+    if not isinstance(issues, list):
+        raise MalformedReview("issues is not a list")
+
+    out = {"score": score, "issues": normalize_issues(issues)}
+    for name in ("security", "performance", "suggestions"):
+        out[name] = ensure_list_of_str(data.get(name) or [])
+    out.update((k, data[k]) for k in keep if k in data)
+    out["schema_version"] = REVIEW_SCHEMA_VERSION
+    return out
 
 
 class ReviewOut(BaseModel):
@@ -46,66 +169,58 @@ class ReviewOut(BaseModel):
     suggestions: Optional[List[str]] = None
     error: Optional[str] = None
 
+    @classmethod
+    def from_docs(cls, submission: dict, review: Optional[dict]) -> "ReviewOut":
+        score = issues = security = performance = suggestions = None
+        canonical = False
+        if review:
+            canonical = review.get("schema_version") == REVIEW_SCHEMA_VERSION
+            score = review.get("score")
+            issues = review.get("issues", [])
+            security = review.get("security", [])
+            performance = review.get("performance", [])
+            suggestions = review.get("suggestions", [])
+
+        return cls.model_validate(
+            {
+                "id": str(submission["_id"]),
+                "status": submission["status"],
+                "created_at": submission["created_at"],
+                "updated_at": submission["updated_at"],
+                "language": submission["language"],
+                "score": score,
+                "issues": issues,
+                "security": security,
+                "performance": performance,
+                "suggestions": suggestions,
+                "error": submission.get("error"),
+            },
+            context={"canonical": canonical},
+        )
+
     @field_validator("issues", mode="before")
     @classmethod
-    def _normalize_issues(cls, v):
-        if v is None:
+    def _normalize_issues(cls, v, info: ValidationInfo):
+        if info.context and info.context.get("canonical"):
             return v
-        out = []
-        for it in v:
-            if isinstance(it, dict):
-                title = it.get("title") or it.get("name") or it.get("summary")
-                detail = (
-                    it.get("detail")
-                    or it.get("description")
-                    or it.get("message")
-                    or str(it)
-                )
-                severity = (
-                    it.get("severity")
-                    if it.get("severity") in {"low", "med", "high"}
-                    else "med"
-                )
-                category = (
-                    it.get("category")
-                    if it.get("category")
-                    in {"style", "bug", "security", "perf", "other"}
-                    else "other"
-                )
-                out.append(
-                    {
-                        "title": title or (detail[:80] if detail else "Issue"),
-                        "detail": detail or "No details provided.",
-                        "severity": severity,
-                        "category": category,
-                    }
-                )
-            elif isinstance(it, str):
-                out.append(
-                    {
-                        "title": it[:80],
-                        "detail": it,
-                        "severity": "med",
-                        "category": "other",
-                    }
-                )
-            else:
-                continue
-        return out
+        return normalize_issues(v)
 
     @field_validator("security", "performance", "suggestions", mode="before")
     @classmethod
-    def _ensure_list_of_str(cls, v):
-        if v is None:
+    def _ensure_list_of_str(cls, v, info: ValidationInfo):
+        if info.context and info.context.get("canonical"):
             return v
-        if isinstance(v, str):
-            return [v]
-        if isinstance(v, list):
-            return [str(x) for x in v]
-        return [str(v)]
+        return ensure_list_of_str(v)
 
 
 class StatsOut(BaseModel):
     total: int
     avg_score: Optional[float]
     common_issues: List[str]
+
+
+class StatsPoint(BaseModel):
+    bucket: datetime
+    total: int
+    avg_score: Optional[float]
+    histogram: Dict[str, int]
@@ -0,0 +1,43 @@
+from pymongo import UpdateOne
+from . import db
+
+
+async def backfill_scores(batch_size: int = 1000):
+    """One-off copy of review scores onto submissions completed before they had one."""
+    cur = db.submissions.aggregate(
+        [
+            {"$match": {"status": "completed", "score": {"$exists": False}}},
+            {
+                "$lookup": {
+                    "from": "reviews",
+                    "localField": "review_id",
+                    "foreignField": "_id",
+                    "pipeline": [{"$project": {"score": 1}}],
+                    "as": "review",
+                }
+            },
+            {"$project": {"score": {"$arrayElemAt": ["$review.score", 0]}}},
+        ]
+    )
+    ops = []
+    async for doc in cur:
+        score = doc.get("score")
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"score": score}}))
+        if len(ops) >= batch_size:
+            await db.submissions.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        await db.submissions.bulk_write(ops, ordered=False)
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    async def _main():
+        await db.init_db()
+        try:
+            await backfill_scores()
+        finally:
+            await db.close_db()
+
+    asyncio.run(_main())
@@ -0,0 +1,100 @@
+"""Token counting, prompt minification and output budgets.
+
+tiktoken is optional; without it, or when its encoding cannot be loaded
+(it is downloaded on first use), counts fall back to the len/4 estimate.
+"""
+
+from functools import lru_cache
+import io
+import re
+import tokenize
+from .config import settings
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+# Whole-line comment prefix per language; "#" is not a comment in C
+# (preprocessor) or PHP 8 (attributes), so default to "//".
+_LINE_COMMENT = {"python": "#", "ruby": "#"}
+_HEADERS = {
+    "#": re.compile(r"\A\s*(?:#[^\n]*\n)+"),
+    "//": re.compile(r"\A\s*(?:/\*.*?\*/|(?://[^\n]*\n)+)", re.S),
+}
+_LICENSE = re.compile(r"licen[cs]e|copyright|spdx-license-identifier", re.I)
+_BLANK_RUNS = re.compile(r"\n{3,}")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    from .ai import MODEL
+
+    try:
+        try:
+            return tiktoken.encoding_for_model(MODEL)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # e.g. offline without a warmed TIKTOKEN_CACHE_DIR
+        return None
+
+
+def count_tokens(text: str) -> int:
+    enc = _encoding()
+    if enc is None:
+        return len(text) // 4 + 1
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def _python_comment_lines(code: str) -> set:
+    lines = code.split("\n")
+    out = set()
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+            row = tok.start[0]
+            if tok.type != tokenize.COMMENT:
+                continue
+            if lines[row - 1].lstrip().startswith("#"):
+                out.add(row)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return set()
+    return out
+
+
+def minify(language: str, code: str) -> str:
+    """Drop what costs tokens but not review quality.
+
+    Only removes a leading license header, whole-line comments and runs of
+    blank lines; code, strings and docstrings are left byte-for-byte.
+    """
+    if not settings.TOKEN_MINIFY_ENABLED:
+        return code
+
+    prefix = _LINE_COMMENT.get(language, "//")
+    header = _HEADERS[prefix].match(code)
+    if header and _LICENSE.search(header.group()):
+        code = code[header.end() :].lstrip("\n")
+
+    if language == "python":
+        drop = _python_comment_lines(code)
+        lines = [ln for i, ln in enumerate(code.split("\n"), 1) if i not in drop]
+    else:
+        lines = [ln for ln in code.split("\n") if not ln.lstrip().startswith(prefix)]
+
+    code = "\n".join(ln.rstrip() for ln in lines)
+    return _BLANK_RUNS.sub("\n\n", code).strip("\n")
+
+
+def max_output_tokens(input_tokens: int) -> int:
+    """Response budget that grows with the input, within fixed bounds."""
+    scaled = settings.LLM_OUTPUT_TOKENS_MIN + int(
+        input_tokens * settings.LLM_OUTPUT_TOKENS_RATIO
+    )
+    return min(settings.LLM_OUTPUT_TOKENS_MAX, scaled)
+
+
+def over_budget(language: str, code: str) -> bool:
+    return count_tokens(minify(language, code)) > settings.LLM_INPUT_TOKEN_BUDGET
@@ -0,0 +1,144 @@
+"""Distributed tracing across the API, the broker and the worker.
+
+With TRACING_EXPORTER=none (or before init_tracing) every helper here is a
+cheap no-op; a configured exporter without the SDK fails at startup.
+"""
+
+from contextlib import nullcontext
+import functools
+import json
+import os
+import threading
+import time
+from typing import Optional
+from .config import settings
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        SpanExporter,
+        SpanExportResult,
+    )
+except ImportError:  # pragma: no cover - optional dependency
+    trace = None
+
+_tracer = None
+_provider = None
+
+
+if trace is not None:
+
+    class JsonlSpanExporter(SpanExporter):
+        """One compact JSON object per finished span, appended to a file."""
+
+        def __init__(self, path: str):
+            self.path = path
+            self._lock = threading.Lock()
+
+        def export(self, spans) -> "SpanExportResult":
+            lines = [json.dumps(_span_record(s), default=str) for s in spans]
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self):
+            pass
+
+
+def _span_record(span) -> dict:
+    ctx = span.get_span_context()
+    return {
+        "trace_id": format(ctx.trace_id, "032x"),
+        "span_id": format(ctx.span_id, "016x"),
+        "parent_id": format(span.parent.span_id, "016x") if span.parent else None,
+        "name": span.name,
+        "service": span.resource.attributes.get("service.name"),
+        "start_ns": span.start_time,
+        "duration_ms": (span.end_time - span.start_time) / 1e6,
+        "status": span.status.status_code.name,
+        "attributes": dict(span.attributes or {}),
+    }
+
+
+def init_tracing(service: str):
+    global _tracer, _provider
+    if _tracer is not None or settings.TRACING_EXPORTER == "none":
+        return
+    if trace is None:
+        raise RuntimeError(
+            f"TRACING_EXPORTER={settings.TRACING_EXPORTER} needs opentelemetry-sdk"
+        )
+    if settings.TRACING_EXPORTER == "otlp":
+        # endpoint and headers come from the standard OTEL_EXPORTER_OTLP_* env
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+            OTLPSpanExporter,
+        )
+
+        exporter = OTLPSpanExporter()
+    else:
+        path = settings.TRACING_JSONL_PATH.format(service=service, pid=os.getpid())
+        exporter = JsonlSpanExporter(path)
+
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": f"ai-code-review-{service}"})
+    )
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    _tracer = _provider.get_tracer("app")
+
+
+def shutdown_tracing():
+    global _tracer, _provider
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = _provider = None
+
+
+def span(name: str, context=None, **attributes):
+    """Context manager for a child of the current span (or of `context`)."""
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.start_as_current_span(
+        name, context=context, attributes=attributes or None
+    )
+
+
+def record_span(name: str, duration_s: float, **attributes):
+    """A span that already finished, e.g. from a driver event with its duration."""
+    if _tracer is None:
+        return
+    end = time.time_ns()
+    s = _tracer.start_span(
+        name, start_time=end - int(duration_s * 1e9), attributes=attributes or None
+    )
+    s.end(end_time=end)
+
+
+def traced(name: str):
+    """Run an async function inside a span."""
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def inject() -> dict:
+    """W3C traceparent/tracestate for the current span, to send with a task."""
+    carrier: dict = {}
+    if _tracer is not None:
+        propagate.inject(carrier)
+    return carrier
+
+
+def extract(carrier: Optional[dict]):
+    if _tracer is None or not carrier:
+        return None
+    return propagate.extract(carrier)
@@ -0,0 +1,92 @@
+from typing import List, Optional, Set, Tuple
+import asyncio
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from . import db
+from .config import settings
+
+_Item = Tuple[dict, object, dict, asyncio.Future]
+
+
+class CompletionWriter:
+    """Write-behind buffer that groups review completions into bulk writes.
+
+    Each completion is one reviews insert plus one submissions update; a flush
+    turns a window of them into one insert_many and one bulk_write. Callers
+    await their own item, so nothing is reported done before it is durable.
+    """
+
+    def __init__(self, max_items: int, max_wait_ms: int):
+        self.max_items = max_items
+        self.max_wait_ms = max_wait_ms
+        self._pending: List[_Item] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+    async def submit(self, review: dict, submission_id, fields: dict):
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((review, submission_id, fields, fut))
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000.0, self._flush)
+        await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._write(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _write(self, batch: List[_Item]):
+        errors: dict = {}
+        try:
+            await db.reviews.insert_many([it[0] for it in batch], ordered=False)
+        except BulkWriteError as e:
+            for err in e.details.get("writeErrors", []):
+                errors[err["index"]] = e
+        except Exception as e:
+            errors = {i: e for i in range(len(batch))}
+
+        # only point submissions at reviews that were actually written
+        ok = [i for i in range(len(batch)) if i not in errors]
+        if ok:
+            try:
+                await db.submissions.bulk_write(
+                    [
+                        UpdateOne({"_id": batch[i][1]}, {"$set": batch[i][2]})
+                        for i in ok
+                    ],
+                    ordered=False,
+                )
+            except BulkWriteError as e:
+                for err in e.details.get("writeErrors", []):
+                    errors[ok[err["index"]]] = e
+            except Exception as e:
+                errors.update({i: e for i in ok})
+
+        for i, (_, _, _, fut) in enumerate(batch):
+            if fut.done():
+                continue
+            if i in errors:
+                fut.set_exception(errors[i])
+            else:
+                fut.set_result(None)
+
+
+_writer: Optional[CompletionWriter] = None
+
+
+def get_writer() -> CompletionWriter:
+    global _writer
+    if _writer is None:
+        _writer = CompletionWriter(
+            max_items=settings.WRITE_BEHIND_MAX_ITEMS,
+            max_wait_ms=settings.WRITE_BEHIND_MAX_WAIT_MS,
+        )
+    return _writer
@@ -0,0 +1,114 @@
+"""CPU cost of encoding one page of reviews, default path vs. FAST_JSON_ENABLED.
+
+The default path mirrors what FastAPI does for `response_model=list[ReviewOut]`:
+build the models, validate them against the response field, dump to Python
+and encode with the stdlib. The fast path writes stored documents straight to
+bytes (orjson when installed). Also times the SSE "done" event encoding.
+
+    python -m benchmarks.bench_json [--page-size 100] [--out results.json]
+"""
+
+import argparse
+import json
+import pathlib
+import timeit
+from typing import List
+
+from bson import ObjectId
+from pydantic import TypeAdapter
+
+from app import fastjson
+from app.events import jsonable_review
+from app.schemas import ReviewOut, canonical_review
+
+PAGE = TypeAdapter(List[ReviewOut])
+
+
+def make_page(n: int):
+    docs = []
+    for i in range(n):
+        review = canonical_review(
+            {
+                "score": 1 + i % 10,
+                "issues": [
+                    {
+                        "title": f"Issue {j}",
+                        "detail": "Guard against an empty list before dividing.",
+                        "severity": "med",
+                        "category": "correctness",
+                    }
+                    for j in range(4)
+                ],
+                "security": ["Validate input"],
+                "performance": ["Avoid the quadratic scan"],
+                "suggestions": ["Add tests", "Extract a helper"],
+            }
+        )
+        review["_id"] = ObjectId()
+        sub = {
+            "_id": ObjectId(),
+            "language": "python",
+            "status": "completed",
+            "created_at": "2024-05-01T12:00:00.123456",
+            "updated_at": "2024-05-01T12:00:03.654321",
+            "error": None,
+            "review": [review],
+        }
+        docs.append(sub)
+    return docs
+
+
+def default_list(docs) -> bytes:
+    models = [ReviewOut.from_docs(d, d["review"][0]) for d in docs]
+    content = PAGE.dump_python(PAGE.validate_python(models), mode="json")
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode()
+
+
+def fast_list(docs) -> bytes:
+    return fastjson.dumps([fastjson.review_out(d, d["review"][0]) for d in docs])
+
+
+def per_call_us(fn, number: int) -> float:
+    best = min(timeit.repeat(fn, number=number, repeat=5))
+    return round(best / number * 1e6, 2)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--page-size", type=int, default=100)
+    ap.add_argument("--number", type=int, default=200)
+    ap.add_argument("--out", help="write the JSON summary here")
+    args = ap.parse_args()
+
+    docs = make_page(args.page_size)
+    assert json.loads(default_list(docs)) == json.loads(fast_list(docs))
+
+    event = {"status": "completed", "review": jsonable_review(docs[0]["review"][0])}
+    summary = {
+        "page_size": args.page_size,
+        "orjson": fastjson.orjson is not None,
+        "list_page_us": {
+            "default": per_call_us(lambda: default_list(docs), args.number),
+            "fast": per_call_us(lambda: fast_list(docs), args.number),
+        },
+        "sse_done_event_us": {
+            "default": per_call_us(lambda: json.dumps(event), args.number * 10),
+            "fast": per_call_us(
+                lambda: fastjson.dumps(event).decode(), args.number * 10
+            ),
+        },
+    }
+    for key in ("list_page_us", "sse_done_event_us"):
+        d = summary[key]
+        d["speedup"] = round(d["default"] / d["fast"], 2) if d["fast"] else None
+
+    text = json.dumps(summary, indent=2)
+    print(text)
+    if args.out:
+        pathlib.Path(args.out).write_text(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
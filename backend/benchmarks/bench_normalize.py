@@ -0,0 +1,141 @@
+"""Cache hit rate of the code-hash normalization levels on resubmissions.
+
+Each corpus file is resubmitted with the edits developers typically make
+without changing behavior (comments, blank lines, indentation, trailing
+whitespace, CRLF), and we count how many resubmissions hash to the original
+key. `code_change_hits` counts a single variable rename that still hit; it is
+a smoke check, not evidence that different programs never share a key (see
+tests/test_normalize.py for the collisions guarded against).
+
+    python -m benchmarks.bench_normalize [--corpus DIR] [--out results.json]
+"""
+
+import argparse
+import json
+import pathlib
+import re
+import time
+
+from app.cache import code_hash
+
+EXTENSIONS = {
+    ".py": "python",
+    ".js": "javascript",
+    ".ts": "typescript",
+    ".java": "java",
+    ".go": "go",
+    ".c": "c",
+    ".cpp": "cpp",
+    ".rs": "rust",
+    ".rb": "ruby",
+    ".php": "php",
+}
+
+BUILTIN = {
+    "python": (
+        "def mean(xs):\n    total = 0\n    for x in xs:\n        total += x\n"
+        "    return total / len(xs)\n"
+    ),
+    "javascript": (
+        "function mean(xs) {\n  let total = 0;\n  for (const x of xs) {\n"
+        "    total += x;\n  }\n  return total / xs.length;\n}\n"
+    ),
+    "go": (
+        "func Mean(xs []float64) float64 {\n\ttotal := 0.0\n"
+        "\tfor _, x := range xs {\n\t\ttotal += x\n\t}\n"
+        "\treturn total / float64(len(xs))\n}\n"
+    ),
+    "rust": (
+        "fn mean(xs: &[f64]) -> f64 {\n    let mut total = 0.0;\n"
+        "    for x in xs {\n        total += x;\n    }\n"
+        "    total / xs.len() as f64\n}\n"
+    ),
+    "ruby": (
+        "def mean(xs)\n  total = 0\n  xs.each { |x| total += x }\n"
+        "  total / xs.size\nend\n"
+    ),
+}
+
+COMMENT = {"python": "#", "ruby": "#"}
+
+
+def _comment(language: str) -> str:
+    return COMMENT.get(language, "//")
+
+
+def variants(language: str, code: str) -> dict:
+    """Behavior-preserving edits, keyed by name, plus one rename."""
+    lines = code.splitlines()
+    c = _comment(language)
+    indent = re.compile(r"^( +)")
+    out = {
+        "add_comment_line": "\n".join([f"{c} reviewed again"] + lines),
+        "trailing_comment": "\n".join(
+            ln + f"  {c} note" if ln.strip() and i == len(lines) // 2 else ln
+            for i, ln in enumerate(lines)
+        ),
+        "blank_lines": "\n\n".join(lines),
+        "trailing_ws": "\n".join(ln + "   " for ln in lines),
+        "crlf": "\r\n".join(lines),
+        "reindent": "\n".join(
+            indent.sub(lambda m: " " * (len(m.group(1)) // 2), ln) for ln in lines
+        ),
+    }
+    out["code_change"] = code.replace("total", "acc", 1).replace("total", "acc")
+    return out
+
+
+def load_corpus(path: str | None) -> list:
+    if not path:
+        return list(BUILTIN.items())
+    items = []
+    for p in sorted(pathlib.Path(path).rglob("*")):
+        lang = EXTENSIONS.get(p.suffix)
+        if lang and p.is_file():
+            items.append((lang, p.read_text(encoding="utf-8", errors="replace")))
+    return items
+
+
+def run(corpus: list) -> dict:
+    results = {}
+    for level in (0, 1):
+        hits = total = 0
+        code_change_hits = 0
+        per_variant: dict = {}
+        start = time.perf_counter()
+        for language, code in corpus:
+            base = code_hash(language, code, level=level)
+            for name, variant in variants(language, code).items():
+                same = code_hash(language, variant, level=level) == base
+                if name == "code_change":
+                    code_change_hits += same
+                    continue
+                total += 1
+                hits += same
+                per_variant.setdefault(name, [0, 0])
+                per_variant[name][0] += same
+                per_variant[name][1] += 1
+        results[f"level_{level}"] = {
+            "hit_rate": round(hits / total, 4) if total else None,
+            "code_change_hits": code_change_hits,
+            "per_variant": {k: round(h / n, 4) for k, (h, n) in per_variant.items()},
+            "hash_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+    return {"files": len(corpus), **results}
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--corpus", help="directory of source files (default: built-in)")
+    ap.add_argument("--out", help="write the JSON summary here")
+    args = ap.parse_args()
+
+    summary = run(load_corpus(args.corpus))
+    text = json.dumps(summary, indent=2)
+    print(text)
+    if args.out:
+        pathlib.Path(args.out).write_text(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
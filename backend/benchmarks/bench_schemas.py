@@ -0,0 +1,140 @@
+"""Microbenchmarks for review serialization and code hashing.
+
+Covers the ReviewOut validators on raw vs. canonical (schema_version)
+documents, full ReviewOut construction and JSON dumping, and code_hash at
+each normalization level on 1 KB to 1 MB inputs.
+
+    python -m benchmarks.bench_schemas [--quick] [--out results.json]
+"""
+
+import argparse
+import json
+import pathlib
+import timeit
+
+from app.cache import code_hash
+from app.schemas import (
+    ReviewOut,
+    canonical_review,
+    ensure_list_of_str,
+    normalize_issues,
+)
+
+SUBMISSION = {
+    "_id": "65f000000000000000000001",
+    "status": "completed",
+    "created_at": "2024-01-01T00:00:00",
+    "updated_at": "2024-01-01T00:00:05",
+    "language": "python",
+}
+
+SIZES = {"1KB": 1 << 10, "10KB": 10 << 10, "100KB": 100 << 10, "1MB": 1 << 20}
+
+SOURCE = {
+    "python": (
+        "def handler(event, context):\n"
+        "    # validate input\n"
+        "    items = event.get('items', [])\n"
+        "    total = 0\n"
+        "    for it in items:\n"
+        "        total += it['price'] * it['qty']\n"
+        "    return {'total': total}\n\n"
+    ),
+    "javascript": (
+        "function handler(event) {\n"
+        "  // validate input\n"
+        "  const items = event.items || [];\n"
+        "  let total = 0;\n"
+        "  for (const it of items) { total += it.price * it.qty; }\n"
+        "  return { total };\n"
+        "}\n\n"
+    ),
+}
+
+
+def raw_review(n_issues: int) -> dict:
+    return {
+        "score": 7,
+        "issues": [
+            {
+                "title": f"Issue {i}",
+                "detail": "Check the bounds before indexing.",
+                "severity": "med",
+                "category": "bug",
+            }
+            for i in range(n_issues)
+        ],
+        "security": ["Validate input"],
+        "performance": ["Cache the lookup"],
+        "suggestions": ["Add tests", "Split the function"],
+    }
+
+
+def per_call_us(fn, number: int) -> float:
+    best = min(timeit.repeat(fn, number=number, repeat=5))
+    return round(best / number * 1e6, 3)
+
+
+def bench_reviews(quick: bool) -> dict:
+    number = 200 if quick else 2000
+    out = {}
+    for n in (0, 5, 20):
+        raw = raw_review(n)
+        canonical = canonical_review(raw)
+        out[f"{n}_issues"] = {
+            "normalize_issues_us": per_call_us(
+                lambda: normalize_issues(raw["issues"]), number
+            ),
+            "ensure_list_of_str_us": per_call_us(
+                lambda: ensure_list_of_str(raw["suggestions"]), number
+            ),
+            "from_docs_raw_us": per_call_us(
+                lambda: ReviewOut.from_docs(SUBMISSION, raw), number
+            ),
+            "from_docs_canonical_us": per_call_us(
+                lambda: ReviewOut.from_docs(SUBMISSION, canonical), number
+            ),
+            "dump_json_us": per_call_us(
+                ReviewOut.from_docs(SUBMISSION, canonical).model_dump_json, number
+            ),
+        }
+    return out
+
+
+def bench_code_hash(quick: bool) -> dict:
+    out = {}
+    for language, unit in SOURCE.items():
+        for label, size in SIZES.items():
+            if quick and size > SIZES["100KB"]:
+                continue
+            code = (unit * (size // len(unit) + 1))[:size]
+            number = max(1, (1 << 20) // size // (10 if quick else 1))
+            out[f"{language}_{label}"] = {
+                f"level_{level}_ms": round(
+                    per_call_us(lambda: code_hash(language, code, level=level), number)
+                    / 1000,
+                    3,
+                )
+                for level in (0, 1)
+            }
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--quick", action="store_true", help="fewer iterations, no 1MB")
+    ap.add_argument("--out", help="write the JSON summary here")
+    args = ap.parse_args()
+
+    summary = {
+        "reviews": bench_reviews(args.quick),
+        "code_hash": bench_code_hash(args.quick),
+    }
+    text = json.dumps(summary, indent=2)
+    print(text)
+    if args.out:
+        pathlib.Path(args.out).write_text(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
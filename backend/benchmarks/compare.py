@@ -0,0 +1,74 @@
+"""Compare two load-test result files and flag latency/throughput regressions.
+
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 0.10]
+
+Exits 1 when any p95/p99 grows, or throughput drops, by more than the
+threshold (a fraction of the baseline).
+"""
+
+import argparse
+import json
+import pathlib
+import sys
+
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms")
+GATED = ("p95_ms", "p99_ms", "throughput_rps")
+
+
+def _change(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return (new - old) / old
+
+
+def compare(base: dict, cand: dict, threshold: float):
+    rows, regressions = [], []
+    ops = sorted(set(base.get("operations", {})) | set(cand.get("operations", {})))
+    for op in ops:
+        b = base.get("operations", {}).get(op, {})
+        c = cand.get("operations", {}).get(op, {})
+        for metric in (*LOWER_IS_BETTER, "throughput_rps", "errors"):
+            change = _change(b.get(metric), c.get(metric))
+            rows.append((op, metric, b.get(metric), c.get(metric), change))
+            if metric not in GATED or change is None:
+                continue
+            if metric not in LOWER_IS_BETTER:
+                change = -change
+            if change > threshold:
+                regressions.append(f"{op}.{metric} {abs(change):.1%} worse")
+    for key in sorted(set(base.get("ops", {})) | set(cand.get("ops", {}))):
+        b, c = base.get("ops", {}).get(key), cand.get("ops", {}).get(key)
+        if isinstance(b, dict) or isinstance(c, dict):
+            for sub in sorted(set(b or {}) | set(c or {})):
+                x, y = (b or {}).get(sub), (c or {}).get(sub)
+                rows.append(("ops", f"{key}.{sub}", x, y, _change(x, y)))
+        else:
+            rows.append(("ops", key, b, c, _change(b, c)))
+    return rows, regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("baseline")
+    ap.add_argument("candidate")
+    ap.add_argument("--threshold", type=float, default=0.10)
+    args = ap.parse_args()
+
+    base = json.loads(pathlib.Path(args.baseline).read_text())
+    cand = json.loads(pathlib.Path(args.candidate).read_text())
+    rows, regressions = compare(base, cand, args.threshold)
+
+    print(f"baseline {base.get('commit')}  candidate {cand.get('commit')}")
+    header = ("operation", "metric", "baseline", "candidate", "change")
+    print("{:<12} {:<24} {:>12} {:>12} {:>8}".format(*header))
+    for op, metric, b, c, change in rows:
+        pct = "" if change is None else f"{change:+.1%}"
+        print(f"{op:<12} {metric:<24} {str(b):>12} {str(c):>12} {pct:>8}")
+
+    if regressions:
+        print("\nregressions: " + ", ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""OpenAI-compatible chat completions server with synthetic latency and errors.
+
+Answers the review, batch and diff prompts from app.ai with well-formed JSON
+so the real API and worker can be load-tested without a provider.
+
+    python -m benchmarks.fake_llm --port 9999 --latency lognormal \\
+        --median-ms 800 --error-rate 0.02
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:9999/v1.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import zlib
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+_ITEM = re.compile(r"^### Item (\d+) ", re.M)
+
+
+class Latency:
+    """Per-request delay in seconds drawn from the configured distribution."""
+
+    def __init__(self, kind: str, median_ms: float, spread: float, seed=None):
+        self.kind = kind
+        self.median = median_ms / 1000.0
+        self.spread = spread
+        self.rng = random.Random(seed)
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            base = self.median
+        elif self.kind == "uniform":
+            base = self.rng.uniform(
+                self.median * (1 - self.spread), self.median * (1 + self.spread)
+            )
+        else:
+            # lognormal with the given median; spread is sigma
+            base = self.median * math.exp(self.rng.gauss(0, self.spread))
+        return max(0.0, base)
+
+
+def _review(seed: int) -> dict:
+    rng = random.Random(seed)
+    return {
+        "score": rng.randint(4, 9),
+        "issues": [
+            {
+                "title": "Missing input validation",
+                "detail": "Check arguments before use.",
+                "severity": rng.choice(["low", "med", "high"]),
+                "category": "correctness",
+            }
+        ],
+        "security": [],
+        "performance": ["Avoid repeated work in the loop."],
+        "suggestions": ["Add tests."],
+    }
+
+
+def create_app(latency: Latency, error_rate: float, seed=None) -> FastAPI:
+    app = FastAPI(title="fake-llm")
+    rng = random.Random(seed)
+    stats = {"requests": 0, "errors": 0}
+
+    @app.post("/v1/chat/completions")
+    async def chat(request: Request):
+        body = await request.json()
+        messages = body.get("messages") or []
+        system = messages[0]["content"] if messages else ""
+        user = messages[-1]["content"] if messages else ""
+        prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+        stats["requests"] += 1
+
+        await asyncio.sleep(latency.sample())
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            return JSONResponse(
+                {"error": {"message": "synthetic failure", "type": "server_error"}},
+                status_code=rng.choice([429, 500, 503]),
+            )
+
+        # stable across runs, unlike hash() under PYTHONHASHSEED
+        key = zlib.crc32(user.encode())
+        if "Batch mode" in system:
+            data = {
+                "results": [
+                    {"id": int(i), **_review(key + int(i))} for i in _ITEM.findall(user)
+                ]
+            }
+        else:
+            data = _review(key)
+            if "Incremental mode" in system:
+                data["resolved"] = []
+        content = json.dumps(data)
+        completion_tokens = len(content) // 4
+
+        return {
+            "id": f"chatcmpl-fake-{stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=9999)
+    ap.add_argument(
+        "--latency", choices=["fixed", "uniform", "lognormal"], default="lognormal"
+    )
+    ap.add_argument("--median-ms", type=float, default=800)
+    ap.add_argument(
+        "--spread",
+        type=float,
+        default=0.5,
+        help="uniform: +/- fraction of the median; lognormal: sigma",
+    )
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--seed", type=int)
+    args = ap.parse_args()
+
+    latency = Latency(args.latency, args.median_ms, args.spread, args.seed)
+    app = create_app(latency, args.error_rate, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+"""Open-loop load test of the API (and worker) at a target request rate.
+
+Requests arrive on a fixed schedule whether or not earlier ones finished, so
+queueing shows up as latency instead of silently lowering the offered load.
+The mix covers submit, get, stream (submit until done), list and stats.
+
+    # against running services
+    python -m benchmarks.loadtest --base-url http://127.0.0.1:8000 \\
+        --rps 50 --duration 60
+
+    # start the fake LLM, the API and a worker with the current checkout
+    python -m benchmarks.loadtest --spawn --rps 50 --duration 60 --out results.json
+
+Results (latency percentiles per operation, throughput, end-to-end review
+time and Mongo/Redis op deltas) are JSON; compare runs with
+benchmarks.compare.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import random
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import httpx
+import redis
+from pymongo import MongoClient
+
+from app.config import settings
+
+LANGUAGES = ["python", "javascript", "go", "ruby", "java"]
+
+DEFAULT_MIX = {"submit": 40, "get": 25, "stream": 10, "list": 15, "stats": 10}
+
+SNIPPET = {
+    "python": (
+        "def f{n}(xs):\n    total = 0\n    for x in xs:\n"
+        "        total += x * {n}\n    return total\n"
+    ),
+    "javascript": (
+        "function f{n}(xs) {{\n  let t = 0;\n"
+        "  for (const x of xs) t += x * {n};\n  return t;\n}}\n"
+    ),
+    "go": (
+        "func F{n}(xs []int) int {{\n\tt := 0\n"
+        "\tfor _, x := range xs {{\n\t\tt += x * {n}\n\t}}\n\treturn t\n}}\n"
+    ),
+    "ruby": "def f{n}(xs)\n  xs.sum {{ |x| x * {n} }}\nend\n",
+    "java": (
+        "int f{n}(int[] xs) {{\n  int t = 0;\n"
+        "  for (int x : xs) t += x * {n};\n  return t;\n}}\n"
+    ),
+}
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(samples: List[float], errors: int, elapsed: float) -> dict:
+    out = {
+        "count": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else None,
+    }
+    for p in (50, 95, 99):
+        value = percentile(samples, p)
+        out[f"p{p}_ms"] = None if value is None else round(value * 1000, 2)
+    return out
+
+
+class Recorder:
+    def __init__(self):
+        self.latency: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+
+    def add(self, op: str, seconds: float, status: int):
+        ok = status < 400
+        self.latency.setdefault(op, [])
+        self.errors.setdefault(op, 0)
+        if ok:
+            self.latency[op].append(seconds)
+        else:
+            self.errors[op] += 1
+        codes = self.statuses.setdefault(op, {})
+        codes[str(status)] = codes.get(str(status), 0) + 1
+
+
+class Workload:
+    def __init__(self, client: httpx.AsyncClient, rec: Recorder, dup_ratio: float):
+        self.client = client
+        self.rec = rec
+        self.dup_ratio = dup_ratio
+        self.rng = random.Random(42)
+        self.ids: List[str] = []
+        self.counter = 0
+
+    def _payload(self) -> dict:
+        if self.counter and self.rng.random() < self.dup_ratio:
+            n = self.rng.randrange(1, self.counter + 1)
+        else:
+            self.counter += 1
+            n = self.counter
+        language = LANGUAGES[n % len(LANGUAGES)]
+        return {"language": language, "code": SNIPPET[language].format(n=n)}
+
+    async def _timed(self, op: str, method: str, url: str, **kw) -> httpx.Response:
+        start = time.perf_counter()
+        try:
+            r = await self.client.request(method, url, **kw)
+        except httpx.HTTPError:
+            self.rec.add(op, time.perf_counter() - start, 599)
+            raise
+        self.rec.add(op, time.perf_counter() - start, r.status_code)
+        return r
+
+    async def submit(self) -> Optional[str]:
+        r = await self._timed("submit", "POST", "/api/reviews", json=self._payload())
+        if r.status_code == 202:
+            sid = r.json()["id"]
+            self.ids.append(sid)
+            return sid
+        return None
+
+    async def get(self):
+        if not self.ids:
+            return await self.submit()
+        await self._timed("get", "GET", f"/api/reviews/{self.rng.choice(self.ids)}")
+
+    async def list(self):
+        await self._timed("list", "GET", "/api/reviews", params={"page_size": 20})
+
+    async def stats(self):
+        await self._timed("stats", "GET", "/api/stats")
+
+    async def stream(self):
+        """Submit, then follow the SSE stream to the terminal event."""
+        start = time.perf_counter()
+        sid = await self.submit()
+        if sid is None:
+            return
+        status = 599
+        try:
+            async with self.client.stream(
+                "GET", f"/api/reviews/{sid}/stream", params={"ping": 0}
+            ) as r:
+                status = r.status_code
+                async for line in r.aiter_lines():
+                    if line.startswith("event: done") or line.startswith(
+                        "event: error"
+                    ):
+                        break
+        finally:
+            self.rec.add("review_e2e", time.perf_counter() - start, status)
+
+
+def op_counts(mongo_uri: str, redis_urls: List[str]) -> dict:
+    out: dict = {}
+    try:
+        mc = MongoClient(mongo_uri, serverSelectionTimeoutMS=2000)
+        out["mongo"] = dict(mc.admin.command("serverStatus")["opcounters"])
+        mc.close()
+    except Exception as e:
+        out["mongo_error"] = str(e)
+    seen = set()
+    total = 0
+    for url in redis_urls:
+        r = redis.Redis.from_url(url)
+        kw = r.connection_pool.connection_kwargs
+        server = (kw.get("host"), kw.get("port"))
+        if server in seen:
+            r.close()
+            continue
+        seen.add(server)
+        try:
+            total += int(r.info("stats")["total_commands_processed"])
+        except Exception as e:
+            out["redis_error"] = str(e)
+        finally:
+            r.close()
+    out["redis_commands"] = total
+    return out
+
+
+def _delta(before: dict, after: dict) -> dict:
+    out = {}
+    for key, value in after.items():
+        if isinstance(value, dict):
+            out[key] = {k: v - before.get(key, {}).get(k, 0) for k, v in value.items()}
+        elif isinstance(value, int):
+            out[key] = value - before.get(key, 0)
+    return out
+
+
+async def _quiet(coro):
+    # failures are already counted by the recorder
+    try:
+        await coro
+    except httpx.HTTPError:
+        pass
+
+
+async def drive(
+    base_url: str, rps: float, duration: float, mix: dict, dup_ratio: float
+):
+    rec = Recorder()
+    ops = list(mix)
+    weights = [mix[o] for o in ops]
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=httpx.Timeout(120.0), limits=limits
+    ) as client:
+        work = Workload(client, rec, dup_ratio)
+        rng = random.Random(7)
+        tasks = set()
+        start = time.perf_counter()
+        n = 0
+        while (now := time.perf_counter() - start) < duration:
+            due = n / rps
+            if due > now:
+                await asyncio.sleep(due - now)
+            op = rng.choices(ops, weights)[0]
+            task = asyncio.create_task(_quiet(getattr(work, op)()))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            n += 1
+        elapsed = time.perf_counter() - start
+        if tasks:
+            await asyncio.wait(tasks, timeout=120)
+    return rec, n, elapsed
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except Exception:
+        return None
+
+
+@contextmanager
+def spawned(args):
+    """Fake LLM + API + one worker, all pointed at the fake provider."""
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": "fake",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.fake_port}/v1",
+        "RATE_LIMIT_PER_HOUR": "1000000000",
+        "RATE_LIMIT_PER_MINUTE": "0",
+    }
+    py = sys.executable
+    procs = [
+        subprocess.Popen(
+            [
+                py,
+                "-m",
+                "benchmarks.fake_llm",
+                "--port",
+                str(args.fake_port),
+                "--latency",
+                args.latency,
+                "--median-ms",
+                str(args.median_ms),
+                "--spread",
+                str(args.spread),
+                "--error-rate",
+                str(args.error_rate),
+                "--seed",
+                "1",
+            ],
+            env=env,
+        ),
+        subprocess.Popen(
+            [
+                py,
+                "-m",
+                "uvicorn",
+                "app.main:app",
+                "--port",
+                str(args.api_port),
+                "--workers",
+                str(args.api_workers),
+                "--log-level",
+                "warning",
+            ],
+            env=env,
+        ),
+        subprocess.Popen(
+            [
+                py,
+                "-m",
+                "celery",
+                "-A",
+                "app.queue.celery",
+                "worker",
+                "-I",
+                "worker",
+                "-l",
+                "warning",
+                "--concurrency",
+                str(args.worker_concurrency),
+            ],
+            env=env,
+        ),
+    ]
+    base_url = f"http://127.0.0.1:{args.api_port}"
+    try:
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                if httpx.get(f"{base_url}/api/health", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+        else:
+            raise RuntimeError("API did not become healthy")
+        time.sleep(args.warmup)
+        yield base_url
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+
+def _parse_mix(text: Optional[str]) -> dict:
+    if not text:
+        return DEFAULT_MIX
+    out = {}
+    for part in text.split(","):
+        name, weight = part.split("=")
+        if name not in DEFAULT_MIX:
+            raise SystemExit(f"unknown operation {name!r}")
+        out[name] = float(weight)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--base-url", default="http://127.0.0.1:8000")
+    ap.add_argument("--rps", type=float, default=20)
+    ap.add_argument("--duration", type=float, default=30, help="seconds")
+    ap.add_argument("--mix", help="e.g. submit=40,get=25,stream=10,list=15,stats=10")
+    ap.add_argument(
+        "--dup-ratio", type=float, default=0.3, help="share of resubmitted code"
+    )
+    ap.add_argument("--out", help="write the JSON results here")
+    ap.add_argument("--label", help="free-form name stored with the results")
+
+    spawn = ap.add_argument_group("spawn the stack locally")
+    spawn.add_argument("--spawn", action="store_true")
+    spawn.add_argument("--api-port", type=int, default=8765)
+    spawn.add_argument("--api-workers", type=int, default=1)
+    spawn.add_argument("--worker-concurrency", type=int, default=4)
+    spawn.add_argument("--fake-port", type=int, default=9999)
+    spawn.add_argument("--latency", default="lognormal")
+    spawn.add_argument("--median-ms", type=float, default=800)
+    spawn.add_argument("--spread", type=float, default=0.5)
+    spawn.add_argument("--error-rate", type=float, default=0.0)
+    spawn.add_argument("--warmup", type=float, default=2.0, help="seconds")
+    args = ap.parse_args()
+
+    mix = _parse_mix(args.mix)
+    redis_urls = [
+        settings.CELERY_BROKER_URL,
+        settings.CACHE_REDIS_URL,
+        settings.RATE_LIMIT_REDIS_URL,
+    ]
+
+    def run(base_url: str) -> dict:
+        before = op_counts(settings.MONGODB_URI, redis_urls)
+        rec, sent, elapsed = asyncio.run(
+            drive(base_url, args.rps, args.duration, mix, args.dup_ratio)
+        )
+        after = op_counts(settings.MONGODB_URI, redis_urls)
+        return {
+            "label": args.label,
+            "commit": _git_commit(),
+            "timestamp": int(time.time()),
+            "config": {
+                "rps": args.rps,
+                "duration_s": args.duration,
+                "mix": mix,
+                "dup_ratio": args.dup_ratio,
+                "spawned": args.spawn,
+                **(
+                    {
+                        "latency": args.latency,
+                        "median_ms": args.median_ms,
+                        "spread": args.spread,
+                        "error_rate": args.error_rate,
+                        "worker_concurrency": args.worker_concurrency,
+                        "api_workers": args.api_workers,
+                    }
+                    if args.spawn
+                    else {}
+                ),
+            },
+            "sent": sent,
+            "elapsed_s": round(elapsed, 2),
+            "operations": {
+                op: summarize(samples, rec.errors.get(op, 0), elapsed)
+                for op, samples in rec.latency.items()
+            },
+            "status_codes": rec.statuses,
+            "ops": _delta(before, after),
+        }
+
+    if args.spawn:
+        with spawned(args) as base_url:
+            results = run(base_url)
+    else:
+        results = run(args.base_url)
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.out:
+        pathlib.Path(args.out).write_text(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,8 @@ def _switch_to_temp_db():
     dbmod.db = client[db_name]
     dbmod.submissions = dbmod.db["submissions"]
     dbmod.reviews = dbmod.db["reviews"]
+    dbmod.stats_hourly = dbmod.db["stats_hourly"]
+    dbmod.code_blobs = dbmod.db["code_blobs"]
 
     yield
 
@@ -72,6 +74,8 @@ async def _isolate_env_and_counters():
     except Exception:
         pass
     cache._r = None
+    cache._local.clear()
+    cache._payloads.clear()
 
     yield
 
@@ -119,5 +123,9 @@ def stub_ai_review(monkeypatch):
             "suggestions": ["do X"],
         }
 
+    async def fake_async(language: str, code: str):
+        return fake_sync(language, code)
+
     monkeypatch.setattr(ai_mod, "review_code_sync", fake_sync)
+    monkeypatch.setattr(ai_mod, "review_code_async", fake_async)
     return True
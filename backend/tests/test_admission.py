@@ -0,0 +1,74 @@
+import pytest
+from app import admission
+from app.queue import QUEUE_BATCH, QUEUE_INTERACTIVE_SMALL
+from app.config import settings
+
+
+@pytest.fixture
+def saturated(monkeypatch):
+    async def depth(queue, priority):
+        return 600
+
+    async def rate(queue):
+        return 2.0
+
+    monkeypatch.setattr(admission, "queue_depth", depth)
+    monkeypatch.setattr(admission, "throughput", rate)
+    monkeypatch.setattr(admission, "_estimates", {})
+    monkeypatch.setattr(settings, "ADMISSION_MAX_WAIT_MS", 60_000)
+
+
+@pytest.mark.asyncio
+async def test_sheds_load_past_wait_slo(client, saturated):
+    r = await client.post("/api/reviews", json={"language": "go", "code": "x := 1"})
+    assert r.status_code == 503
+    # 600 queued at 2/s is 300s, 240s over the SLO
+    assert r.headers["Retry-After"] == "240"
+
+
+@pytest.mark.asyncio
+async def test_reports_wait_and_admits_cache_hits(
+    client, saturated, stub_ai_review, run_worker, monkeypatch
+):
+    monkeypatch.setattr(settings, "ADMISSION_MAX_WAIT_MS", 0)
+    payload = {"language": "go", "code": "y := 2"}
+
+    r = await client.post("/api/reviews", json=payload)
+    assert r.status_code == 202
+    assert r.json()["estimated_wait_ms"] == 300_000
+    await run_worker(r.json()["id"])
+
+    monkeypatch.setattr(settings, "ADMISSION_MAX_WAIT_MS", 60_000)
+    hit = await client.post("/api/reviews", json=payload)
+    assert hit.status_code == 202
+    assert hit.json()["status"] == "completed"
+    assert hit.json()["estimated_wait_ms"] == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_backlog_does_not_shed_interactive(client, monkeypatch):
+    async def depth(queue, priority):
+        return 10_000 if queue == QUEUE_BATCH else 1
+
+    async def rate(queue):
+        return 1.0
+
+    monkeypatch.setattr(admission, "queue_depth", depth)
+    monkeypatch.setattr(admission, "throughput", rate)
+    monkeypatch.setattr(admission, "_estimates", {})
+    monkeypatch.setattr(settings, "ADMISSION_MAX_WAIT_MS", 60_000)
+
+    code = "z := 3"
+    r = await client.post("/api/reviews", json={"language": "go", "code": code})
+    assert r.status_code == 202
+    assert r.json()["estimated_wait_ms"] == 1000
+    assert await admission.estimate_wait_ms(QUEUE_INTERACTIVE_SMALL) == 1000
+
+    batch = {"language": "go", "code": "w := 4", "priority": "batch"}
+    assert (await client.post("/api/reviews", json=batch)).status_code == 503
+
+    # a duplicate of the queued interactive review rides along, never shed
+    monkeypatch.setattr(settings, "ADMISSION_MAX_WAIT_MS", 1)
+    follower = await client.post("/api/reviews", json={"language": "go", "code": code})
+    assert follower.status_code == 202
+    assert follower.json()["status"] == "pending"
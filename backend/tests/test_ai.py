@@ -0,0 +1,49 @@
+import json
+from types import SimpleNamespace
+import pytest
+from tenacity import wait_none
+from app import ai as ai_mod
+
+
+def _completion(content: str):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5),
+    )
+
+
+@pytest.mark.asyncio
+async def test_malformed_answers_are_retried(monkeypatch):
+    answers = [
+        "not json",
+        json.dumps({"score": 42, "issues": []}),
+        json.dumps({"score": 7, "issues": [{"title": "t", "category": "testability"}]}),
+    ]
+
+    async def create(**_):
+        return _completion(answers.pop(0))
+
+    monkeypatch.setattr(ai_mod.async_client.chat.completions, "create", create)
+    review_code = ai_mod.review_code_async.retry_with(wait=wait_none())
+    data = await review_code("python", "x = 1")
+
+    assert answers == []
+    assert data["score"] == 7
+    assert data["issues"][0]["category"] == "testability"
+    assert data["prompt_tokens"] == 10
+    assert data["schema_version"] == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_items_store_their_share_of_usage(monkeypatch):
+    results = [{"id": i, "score": 5, "issues": []} for i in range(3)]
+
+    async def create(**_):
+        return _completion(json.dumps({"results": results}))
+
+    monkeypatch.setattr(ai_mod.async_client.chat.completions, "create", create)
+    out = await ai_mod.review_batch_async([("python", f"x = {i}") for i in range(3)])
+
+    assert sum(r["prompt_tokens"] for r in out) == 10
+    assert sum(r["completion_tokens"] for r in out) == 5
+    assert out[0]["batch_usage"] == {"prompt_tokens": 10, "completion_tokens": 5}
@@ -0,0 +1,40 @@
+import asyncio
+import pytest
+from app import ai as ai_mod
+from app.batching import MicroBatcher
+
+
+@pytest.mark.asyncio
+async def test_small_reviews_share_one_request(monkeypatch):
+    calls = []
+
+    async def fake_batch(items):
+        calls.append(len(items))
+        return [{"score": 5 + i} if i != 1 else None for i in range(len(items))]
+
+    async def fake_single(language, code):
+        return {"score": 1, "single": code}
+
+    monkeypatch.setattr(ai_mod, "review_batch_async", fake_batch)
+    monkeypatch.setattr(ai_mod, "review_code_async", fake_single)
+
+    batcher = MicroBatcher(max_items=3, max_tokens=10_000, max_wait_ms=1000)
+    results = await asyncio.gather(
+        *(batcher.review("python", f"x = {i}") for i in range(3))
+    )
+
+    assert calls == [3]
+    assert results[0]["score"] == 5
+    assert results[1] == {"score": 1, "single": "x = 1"}
+    assert results[2]["score"] == 7
+
+
+@pytest.mark.asyncio
+async def test_batch_flushes_after_max_wait(monkeypatch):
+    async def fake_single(language, code):
+        return {"score": 9}
+
+    monkeypatch.setattr(ai_mod, "review_code_async", fake_single)
+
+    batcher = MicroBatcher(max_items=10, max_tokens=10_000, max_wait_ms=10)
+    assert await asyncio.wait_for(batcher.review("go", "x := 1"), 1.0) == {"score": 9}
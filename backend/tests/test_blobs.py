@@ -0,0 +1,65 @@
+import pytest
+from bson import ObjectId
+from app import db as dbmod
+from app import blobs
+from app.config import settings
+
+
+@pytest.mark.parametrize("codec", ["zstd", "zlib", "none"])
+def test_compress_round_trip(monkeypatch, codec):
+    if codec == "zstd" and blobs.zstandard is None:
+        pytest.skip("zstandard not installed")
+    monkeypatch.setattr(settings, "CODE_BLOB_COMPRESSION", codec)
+    raw = ("def f(x):\n    return x * 2  # é\n" * 200).encode("utf-8")
+
+    used, payload = blobs.compress(raw)
+    assert used == codec
+    assert blobs.decompress(used, payload) == raw
+    if codec != "none":
+        assert len(payload) < len(raw)
+
+
+@pytest.mark.asyncio
+async def test_submissions_share_one_blob(client, stub_ai_review, run_worker):
+    code = "def add(a, b):\n    return a + b\n"
+    payload = {"language": "python", "code": code}
+
+    leader = (await client.post("/api/reviews", json=payload)).json()
+    follower = (await client.post("/api/reviews", json=payload)).json()
+
+    key = blobs.blob_id(code)
+    subs = await dbmod.submissions.find(
+        {"_id": {"$in": [ObjectId(leader["id"]), ObjectId(follower["id"])]}}
+    ).to_list(length=None)
+    assert [s["code_blob"] for s in subs] == [key, key]
+    assert all("code" not in s for s in subs)
+
+    assert await dbmod.code_blobs.count_documents({"_id": key}) == 1
+    blob = await dbmod.code_blobs.find_one({"_id": key})
+    assert blob["size"] == len(code.encode("utf-8"))
+    assert await blobs.get_code(key) == code
+
+    await run_worker(leader["id"])
+    r = await client.get(f"/api/reviews/{leader['id']}")
+    assert r.json()["status"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_worker_reads_inline_code_of_older_submissions(
+    stub_ai_review, run_worker
+):
+    ins = await dbmod.submissions.insert_one(
+        {
+            "code": "x = 1\n",
+            "language": "python",
+            "status": "pending",
+            "created_at": "2024-01-01T00:00:00",
+            "updated_at": "2024-01-01T00:00:00",
+            "review_id": None,
+            "error": None,
+        }
+    )
+    await run_worker(str(ins.inserted_id))
+
+    sub = await dbmod.submissions.find_one({"_id": ins.inserted_id})
+    assert sub["status"] == "completed"
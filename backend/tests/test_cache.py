@@ -26,3 +26,149 @@ async def test_cache_hit_returns_completed(client, run_worker):
 
     sub2 = await dbmod.submissions.find_one({"_id": ObjectId(rid2)})
     assert sub2 and sub2.get("review_id")
+
+
+@pytest.mark.asyncio
+async def test_inflight_duplicates_follow_leader(client, stub_ai_review, run_worker):
+    payload = {"language": "python", "code": "print('single flight')"}
+
+    leader = (await client.post("/api/reviews", json=payload)).json()
+    follower = (await client.post("/api/reviews", json=payload)).json()
+    assert leader["status"] == follower["status"] == "pending"
+
+    sub_f = await dbmod.submissions.find_one({"_id": ObjectId(follower["id"])})
+    assert sub_f["leader_id"] == ObjectId(leader["id"])
+
+    await run_worker(leader["id"])
+
+    sub_l = await dbmod.submissions.find_one({"_id": ObjectId(leader["id"])})
+    sub_f = await dbmod.submissions.find_one({"_id": ObjectId(follower["id"])})
+    assert sub_f["status"] == "completed"
+    assert sub_f["review_id"] == sub_l["review_id"]
+
+
+@pytest.mark.asyncio
+async def test_failed_enqueue_releases_the_inflight_slot(client, monkeypatch):
+    from app.cache import inflight_leader, code_hash
+    from app.routes import reviews as reviews_routes
+
+    async def broken_enqueue(*args, **kwargs):
+        raise ConnectionError("broker down")
+
+    monkeypatch.setattr(reviews_routes, "enqueue", broken_enqueue)
+    payload = {"language": "python", "code": "print('no broker')"}
+    with pytest.raises(ConnectionError):
+        await client.post("/api/reviews", json=payload)
+
+    key = code_hash(payload["language"], payload["code"])
+    assert await inflight_leader(key) is None
+    sub = await dbmod.submissions.find_one({"code_hash": key})
+    assert sub["status"] == "failed"
+
+
+@pytest.mark.asyncio
+async def test_follower_of_vanished_leader_is_requeued_once(client, monkeypatch):
+    from app.routes import reviews as reviews_routes
+
+    queued = []
+
+    async def fake_enqueue(submission_id, *args, **kwargs):
+        queued.append(submission_id)
+
+    monkeypatch.setattr(reviews_routes, "enqueue", fake_enqueue)
+    ins = await dbmod.submissions.insert_one(
+        {
+            "code": "print('orphan')",
+            "language": "python",
+            "status": "in_progress",
+            "created_at": "2024-01-01T00:00:00",
+            "updated_at": "2024-01-01T00:00:00",
+            "ip": "127.0.0.1",
+            "review_id": None,
+            "error": None,
+            "code_hash": "py1:orphan",
+            "leader_id": ObjectId(),
+        }
+    )
+    sid = str(ins.inserted_id)
+
+    for _ in range(2):
+        r = await client.get(f"/api/reviews/{sid}")
+        assert r.json()["status"] == "pending"
+
+    assert queued == [sid]
+    sub = await dbmod.submissions.find_one({"_id": ins.inserted_id})
+    assert "leader_id" not in sub
+
+
+@pytest.mark.asyncio
+async def test_follower_waits_for_a_queued_leader_after_its_key_expires(
+    client, monkeypatch
+):
+    from app.routes import reviews as reviews_routes
+
+    queued = []
+
+    async def fake_enqueue(submission_id, *args, **kwargs):
+        queued.append(submission_id)
+
+    monkeypatch.setattr(reviews_routes, "enqueue", fake_enqueue)
+    base = {
+        "code": "print('slow queue')",
+        "language": "python",
+        "created_at": "2024-01-01T00:00:00",
+        "updated_at": "2024-01-01T00:00:00",
+        "ip": "127.0.0.1",
+        "review_id": None,
+        "error": None,
+        "code_hash": "py1:slow-queue",
+    }
+    leader = await dbmod.submissions.insert_one({**base, "status": "pending"})
+    ins = await dbmod.submissions.insert_one(
+        {**base, "status": "pending", "leader_id": leader.inserted_id}
+    )
+
+    r = await client.get(f"/api/reviews/{ins.inserted_id}")
+    assert r.json()["status"] == "pending"
+    assert queued == []
+    sub = await dbmod.submissions.find_one({"_id": ins.inserted_id})
+    assert sub["leader_id"] == leader.inserted_id
+
+
+@pytest.mark.asyncio
+async def test_inflight_refresh_only_extends_the_owner(client):
+    from app.cache import get_cache, inflight_acquire, inflight_refresh, _k
+
+    assert await inflight_acquire("py1:refresh", "a", ttl=5) is None
+    await inflight_refresh("py1:refresh", "b", 600)
+    r = await get_cache()
+    assert await r.ttl(_k("inflight:py1:refresh")) <= 5
+    await inflight_refresh("py1:refresh", "a", 600)
+    assert await r.ttl(_k("inflight:py1:refresh")) > 5
+
+
+def test_local_lru_bounds_and_expiry():
+    from app.cache import LocalLRU
+
+    lru = LocalLRU(maxsize=2, ttl=60)
+    lru.set("a", "1")
+    lru.set("b", "2")
+    assert lru.get("a") == "1"
+    lru.set("c", "3")
+    assert lru.get("b") is None
+    assert lru.get("c") == "3"
+
+    lru.set("d", "4", ttl=0)
+    assert lru.get("d") is None
+    assert lru.stats()["evictions"] == 2
+    assert lru.hits == 2 and lru.misses == 2
+
+
+def test_own_invalidations_keep_the_local_entry():
+    from app import cache
+
+    cache._local.set("k", "1")
+    cache._on_invalidate({"key": "k", "origin": cache._origin()})
+    assert cache._local.get("k") == "1"
+    cache._on_invalidate({"key": "k", "origin": "another-process"})
+    assert cache._local.get("k") is None
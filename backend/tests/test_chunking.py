@@ -0,0 +1,68 @@
+from app.chunking import merge_reviews, split_code
+
+
+def test_python_splits_at_top_level_definitions():
+    code = "\n".join(
+        ["import os", ""]
+        + ["def a():"]
+        + ["    x = 1"] * 5
+        + ["@decorator", "class B:"]
+        + ["    y = 2"] * 5
+        + ["def c():", "    return 3"]
+    )
+    chunks = split_code("python", code, max_lines=8)
+
+    assert [c.text.splitlines()[0] for c in chunks] == [
+        "import os",
+        "@decorator",
+        "def c():",
+    ]
+    assert "\n".join(c.text for c in chunks) == code
+
+
+def test_brace_languages_split_outside_blocks():
+    code = "\n".join(
+        ["package main", ""]
+        + ["func a() {", "    if x {", "        y()", "    }", "}"]
+        + ["func (s *S) b() int {", "    return 1", "}"]
+    )
+    chunks = split_code("go", code, max_lines=5)
+
+    assert [c.start for c in chunks] == [0, 2, 7]
+
+
+def test_oversized_function_is_cut_by_lines():
+    code = "\n".join(["def big():"] + ["    pass"] * 11)
+    chunks = split_code("python", code, max_lines=5)
+    assert [c.end - c.start for c in chunks] == [5, 5, 2]
+
+
+def test_merge_dedupes_and_weights_scores():
+    merged = merge_reviews(
+        [
+            (
+                {
+                    "score": 9,
+                    "issues": [{"title": "Naming", "severity": "low"}],
+                    "suggestions": ["Add tests"],
+                    "duration_ms": 100,
+                },
+                300,
+            ),
+            (
+                {
+                    "score": 3,
+                    "issues": [{"title": "naming ", "severity": "high"}],
+                    "suggestions": ["add tests", "Use a context manager"],
+                    "duration_ms": 250,
+                },
+                100,
+            ),
+        ]
+    )
+
+    assert merged["score"] == 8
+    assert merged["issues"] == [{"title": "naming ", "severity": "high"}]
+    assert merged["suggestions"] == ["Add tests", "Use a context manager"]
+    assert merged["duration_ms"] == 250
+    assert merged["chunks"] == 2
@@ -0,0 +1,61 @@
+import json
+import pytest
+from datetime import datetime
+from bson import ObjectId
+from app import db as dbmod
+from app.config import settings
+from app.fastjson import dumps, review_out
+from app.schemas import ReviewOut, canonical_review
+
+NOW = "2024-05-01T12:00:00.123456"
+
+
+def _submission(**extra):
+    return {
+        "_id": ObjectId(),
+        "language": "ruby",
+        "status": "completed",
+        "created_at": NOW,
+        "updated_at": NOW,
+        "error": None,
+        **extra,
+    }
+
+
+@pytest.mark.parametrize(
+    "review",
+    [
+        None,
+        canonical_review({"score": 8, "issues": [{"title": "t", "detail": "d"}]}),
+        {"score": 5, "issues": ["legacy string issue"], "security": "x"},
+    ],
+)
+def test_fast_body_matches_model_serialization(review):
+    sub = _submission()
+    expected = ReviewOut.from_docs(sub, review).model_dump_json()
+    assert dumps(review_out(sub, review)) == expected.encode()
+
+
+@pytest.mark.asyncio
+async def test_list_is_identical_with_fast_json(client, monkeypatch):
+    created = datetime.utcnow().isoformat()
+    rev = await dbmod.reviews.insert_one(
+        canonical_review({"score": 6, "issues": [{"title": "a", "detail": "b"}]})
+    )
+    for _ in range(3):
+        await dbmod.submissions.insert_one(
+            {
+                **_submission(review_id=rev.inserted_id),
+                "created_at": created,
+                "code": "puts 1",
+            }
+        )
+
+    params = {"language": "ruby", "page_size": 2}
+    slow = await client.get("/api/reviews", params=params)
+    monkeypatch.setattr(settings, "FAST_JSON_ENABLED", True)
+    fast = await client.get("/api/reviews", params=params)
+
+    assert fast.status_code == slow.status_code == 200
+    assert json.loads(fast.content) == json.loads(slow.content)
+    assert fast.headers["X-Next-Cursor"] == slow.headers["X-Next-Cursor"]
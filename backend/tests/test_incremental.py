@@ -0,0 +1,58 @@
+import pytest
+from app import ai as ai_mod
+from app.incremental import changed_hunks, review_incremental
+
+BASE = "\n".join(f"line_{i} = {i}" for i in range(20)) + "\n"
+PRIOR = {
+    "score": 6,
+    "issues": [
+        {
+            "title": "Magic numbers",
+            "detail": "a",
+            "severity": "low",
+            "category": "style",
+        },
+        {"title": "Shadowed name", "detail": "b", "severity": "med", "category": "bug"},
+    ],
+    "security": [],
+    "performance": [],
+    "suggestions": ["Add tests"],
+}
+
+
+def test_changed_hunks_counts_only_edits():
+    diff, changed = changed_hunks(BASE, BASE.replace("line_5 = 5", "line_5 = 50"), 3)
+    assert changed == 2
+    assert "-line_5 = 5" in diff and "+line_5 = 50" in diff
+    assert "line_15" not in diff
+
+
+@pytest.mark.asyncio
+async def test_prior_issues_carry_forward_unless_resolved(monkeypatch):
+    seen = {}
+
+    async def fake_diff(language, diff, prior_issues, prior_score):
+        seen["diff"] = diff
+        return {
+            "score": 7,
+            "issues": [{"title": "Off by one", "detail": "c", "severity": "high"}],
+            "suggestions": ["add tests"],
+            "resolved": [1],
+            "duration_ms": 5,
+        }
+
+    monkeypatch.setattr(ai_mod, "review_diff_async", fake_diff)
+    new = BASE.replace("line_5 = 5", "line_5 = 6")
+    out = await review_incremental("python", BASE, new, PRIOR)
+
+    assert "+line_5 = 6" in seen["diff"]
+    assert [it["title"] for it in out["issues"]] == ["Magic numbers", "Off by one"]
+    assert out["suggestions"] == ["Add tests"]
+    assert out["score"] == 7
+    assert out["diff_changed_lines"] == 2
+
+
+@pytest.mark.asyncio
+async def test_large_rewrites_fall_back_to_full_review():
+    rewritten = "\n".join(f"other_{i} = {i}" for i in range(20)) + "\n"
+    assert await review_incremental("python", BASE, rewritten, PRIOR) is None
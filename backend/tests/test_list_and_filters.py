@@ -2,6 +2,7 @@ import pytest
 from datetime import datetime
 from bson import ObjectId
 from app import db as dbmod
+from app.scores import backfill_scores
 
 
 @pytest.mark.asyncio
@@ -48,3 +49,72 @@ async def test_list_filters(client):
     items = resp.json()
     assert all(it["language"] == "python" for it in items)
     assert all((it["score"] or 0) >= 5 for it in items)
+
+
+@pytest.mark.asyncio
+async def test_score_filter_applies_before_pagination(client):
+    for minute, score in ((1, 9), (2, 3), (3, 2)):
+        ts = f"2024-01-01T00:0{minute}:00"
+        rev = await dbmod.reviews.insert_one(
+            {
+                "submission_id": ObjectId(),
+                "score": score,
+                "issues": [],
+                "created_at": ts,
+            }
+        )
+        await dbmod.submissions.insert_one(
+            {
+                "code": "puts 'ok'",
+                "language": "ruby",
+                "status": "completed",
+                "created_at": ts,
+                "updated_at": ts,
+                "ip": "1.1.1.1",
+                "review_id": rev.inserted_id,
+                "error": None,
+            }
+        )
+
+    # written before scores were copied onto submissions
+    await backfill_scores()
+
+    resp = await client.get("/api/reviews?language=ruby&min_score=5&page_size=1")
+    assert resp.status_code == 200
+    items = resp.json()
+    assert len(items) == 1
+    assert items[0]["score"] == 9
+
+
+@pytest.mark.asyncio
+async def test_cursor_pagination_walks_without_overlap(client):
+    ts = "2024-02-01T00:00:00"
+    for _ in range(3):
+        await dbmod.submissions.insert_one(
+            {
+                "code": "<?php echo 1;",
+                "language": "php",
+                "status": "pending",
+                "created_at": ts,
+                "updated_at": ts,
+                "ip": "1.1.1.1",
+                "review_id": None,
+                "error": None,
+            }
+        )
+
+    r1 = await client.get("/api/reviews?language=php&page_size=2")
+    assert r1.status_code == 200
+    first = [it["id"] for it in r1.json()]
+    cursor = r1.headers.get("X-Next-Cursor")
+    assert len(first) == 2 and cursor
+
+    r2 = await client.get(f"/api/reviews?language=php&page_size=2&cursor={cursor}")
+    assert r2.status_code == 200
+    second = [it["id"] for it in r2.json()]
+    assert len(second) == 1
+    assert not set(first) & set(second)
+    assert "X-Next-Cursor" not in r2.headers
+
+    bad = await client.get("/api/reviews?cursor=not-a-cursor")
+    assert bad.status_code == 400
@@ -0,0 +1,17 @@
+import pytest
+
+
+@pytest.mark.asyncio
+async def test_metrics_exposes_route_latency_and_cache_counters(client):
+    await client.get("/api/health")
+    await client.post("/api/reviews", json={"language": "go", "code": "z := 3"})
+
+    r = await client.get("/metrics")
+    assert r.status_code == 200
+    body = r.text
+    assert (
+        'http_request_duration_seconds_count{method="GET",route="/api/health"' in body
+    )
+    assert 'cache_lookups_total{cache="review",result="miss"}' in body
+    assert 'cache_local_total{cache="codehash",event="miss"}' in body
+    assert "redis_command_duration_seconds" in body
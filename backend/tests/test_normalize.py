@@ -0,0 +1,65 @@
+import pytest
+from app.cache import code_hash
+
+
+def test_python_comments_and_blank_lines_share_a_key():
+    a = "def f(x):\n    # add one\n    return x+1\n"
+    b = "def f(x):\n\n  return x + 1  # changed comment\n"
+    assert code_hash("python", a) == code_hash("python", b)
+    assert code_hash("python", a) != code_hash("python", a.replace("1", "2"))
+
+
+def test_c_family_ignores_comments_but_not_strings():
+    a = "function f(a) {\n  // note\n  return a + 1; /* x */\n}\n"
+    b = "function f(a){\n\n return a+1;\n}"
+    assert code_hash("javascript", a) == code_hash("javascript", b)
+    assert code_hash("javascript", 's = "a // b"') != code_hash("javascript", 's = "a"')
+
+
+def test_keys_are_versioned_per_level():
+    code = "print('x')"
+    assert code_hash("python", code).startswith("py1:")
+    assert ":" not in code_hash("python", code, level=0)
+    # unparsable input falls back to the whitespace-only hash
+    assert ":" not in code_hash("python", "def f(:\n  x")
+
+
+@pytest.mark.parametrize("language", ["javascript", "typescript", "go"])
+@pytest.mark.parametrize("a, b", [("return\n x", "return x"), ("x\n++y", "x++\ny")])
+def test_line_breaks_that_change_the_program_do_not_collide(language, a, b):
+    assert code_hash(language, a) != code_hash(language, b)
+
+
+def test_possible_regex_literals_fall_back_to_raw_code():
+    a = "const re = /https?:\\/\\//; a();"
+    b = "const re = /https?:\\/\\//; b();"
+    assert code_hash("javascript", a) != code_hash("javascript", b)
+    assert ":" not in code_hash("javascript", a)
+    # division still normalizes
+    assert code_hash("javascript", "x = (a + b) / 2").startswith("js2:")
+
+
+@pytest.mark.parametrize(
+    "language, a, b",
+    [
+        ("java", "a++ + b", "a + ++b"),
+        ("c", "a++ + b", "a + ++b"),
+        ("javascript", "a++ + b", "a + ++b"),
+        ("cpp", "a - -b", "a--b"),
+        ("cpp", "#define A\nint x = 1;", "#define A int x = 1;"),
+        ("c", "#define f(x) x\n", "#define f (x) x\n"),
+        ("php", "#[Pure]\nfunction f() {}", "function f() {}"),
+        ("ruby", "s =~ /a#b/", "s =~ /a#c/"),
+        ("ruby", "s.split /a#b/", "s.split /a#c/"),
+        ("ruby", "x = %w[a #b]", "x = %w[a #c]"),
+    ],
+)
+def test_whitespace_and_hashes_that_matter_do_not_collide(language, a, b):
+    assert code_hash(language, a) != code_hash(language, b)
+
+
+def test_c_preprocessor_lines_still_normalize_around_them():
+    a = "#include <stdio.h>\n\nint  main() { return 0; } // done\n"
+    b = "#include <stdio.h>\nint main() {\n  return 0;\n}\n"
+    assert code_hash("c", a) == code_hash("c", b)
+    assert code_hash("c", a).startswith("c2:")
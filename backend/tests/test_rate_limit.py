@@ -1,4 +1,10 @@
 import pytest
+from app.config import settings
+
+
+@pytest.fixture
+def shared_redis(monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_REDIS_URL", settings.RATE_LIMIT_REDIS_URL)
 
 
 @pytest.mark.asyncio
@@ -12,3 +18,35 @@ async def test_rate_limit_hits_429(client):
 
     assert codes[:3] == [202, 202, 202]
     assert codes[3] == 429
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_reports_quota_headers(client):
+    payload = {"language": "python", "code": "print('headers')"}
+
+    r = await client.post("/api/reviews", json=payload)
+    assert r.status_code == 202
+    assert r.headers["X-RateLimit-Limit"] == "3"
+    assert r.headers["X-RateLimit-Remaining"] == "2"
+    assert int(r.headers["X-RateLimit-Reset"]) > 0
+
+    for _ in range(2):
+        await client.post("/api/reviews", json=payload)
+    denied = await client.post("/api/reviews", json=payload)
+    assert denied.status_code == 429
+    assert denied.headers["X-RateLimit-Remaining"] == "0"
+    assert int(denied.headers["Retry-After"]) >= 1
+
+
+@pytest.mark.asyncio
+async def test_pipelined_admission_on_shared_redis(shared_redis, client):
+    from app import cache, rate_limit
+
+    assert await cache.get_cache() is await rate_limit.get_rate_redis()
+
+    payload = {"language": "python", "code": "print('pipelined')"}
+    codes = []
+    for _ in range(4):
+        r = await client.post("/api/reviews", json=payload)
+        codes.append(r.status_code)
+    assert codes == [202, 202, 202, 429]
@@ -0,0 +1,23 @@
+from app.config import settings
+from app.queue import QUEUE_BATCH, QUEUE_INTERACTIVE_LARGE, QUEUE_INTERACTIVE_SMALL
+from app.routing import route_for
+
+
+def test_routes_by_size_and_class():
+    small = "x = 1\n"
+    large = "x = 1\n" * settings.QUEUE_LARGE_MIN_TOKENS
+
+    assert route_for(small, "interactive", 1).queue == QUEUE_INTERACTIVE_SMALL
+    assert route_for(large, "interactive", 1).queue == QUEUE_INTERACTIVE_LARGE
+    assert route_for(small, "batch", 1).queue == QUEUE_BATCH
+
+
+def test_busy_clients_lose_priority_then_demote():
+    first = route_for("x = 1", "interactive", 1)
+    third = route_for("x = 1", "interactive", 3)
+    assert first.priority == 0
+    assert third.priority > first.priority
+
+    busy = settings.FAIR_MAX_INTERACTIVE_INFLIGHT + 1
+    flood = route_for("x = 1", "interactive", busy)
+    assert flood.queue == QUEUE_BATCH
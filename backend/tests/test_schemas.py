@@ -0,0 +1,92 @@
+import pytest
+from app.schemas import (
+    REVIEW_SCHEMA_VERSION,
+    MalformedReview,
+    ReviewOut,
+    canonical_review,
+)
+
+SUBMISSION = {
+    "_id": "65f000000000000000000001",
+    "status": "completed",
+    "created_at": "2024-01-01T00:00:00",
+    "updated_at": "2024-01-01T00:00:05",
+    "language": "python",
+}
+
+RAW = {
+    "score": 6,
+    "issues": [
+        {"name": "Unbounded loop", "description": "Add a limit", "severity": "high"},
+        {"title": "Naming", "detail": "Rename", "severity": "urgent", "category": "x"},
+        "Plain string issue",
+        42,
+    ],
+    "security": "Validate input",
+    "performance": None,
+    "suggestions": ["a", 1],
+}
+
+
+def test_canonical_document_reads_the_same_as_raw():
+    stored = canonical_review(RAW)
+    assert stored["schema_version"] == REVIEW_SCHEMA_VERSION
+
+    slow = ReviewOut.from_docs(SUBMISSION, RAW)
+    fast = ReviewOut.from_docs(SUBMISSION, stored)
+    assert fast.model_dump() == {**slow.model_dump(), "performance": []}
+    assert [i.category for i in fast.issues] == ["other", "other", "other"]
+    assert fast.issues[1].severity == "med"
+    assert fast.security == ["Validate input"]
+    assert fast.suggestions == ["a", "1"]
+
+
+def test_model_categories_survive_canonicalization():
+    stored = canonical_review(
+        {
+            "score": "8",
+            "issues": [
+                {"title": "a", "detail": "b", "category": "Readability"},
+                {"title": "c", "detail": "d", "category": "perf"},
+            ],
+        }
+    )
+    assert stored["score"] == 8
+    assert [i["category"] for i in stored["issues"]] == ["readability", "perf"]
+    out = ReviewOut.from_docs(SUBMISSION, stored)
+    assert out.issues[0].category == "readability"
+
+
+@pytest.mark.parametrize(
+    "data", [[], {"score": 11}, {"score": "high"}, {"score": 5, "issues": "none"}]
+)
+def test_malformed_output_is_rejected(data):
+    with pytest.raises(MalformedReview):
+        canonical_review(data)
+
+
+def test_diff_answers_may_omit_the_score():
+    assert canonical_review({"issues": []}, require_score=False)["score"] is None
+
+
+def test_model_output_cannot_set_document_fields():
+    data = {
+        "score": 7,
+        "issues": [],
+        "_id": "x",
+        "submission_id": "y",
+        "schema_version": 99,
+        "model": "spoofed",
+        "duration_ms": 5,
+    }
+    assert set(canonical_review(data)) == {
+        "score",
+        "issues",
+        "security",
+        "performance",
+        "suggestions",
+        "schema_version",
+    }
+    assert canonical_review(data)["schema_version"] == REVIEW_SCHEMA_VERSION
+    kept = canonical_review(data, keep=("duration_ms",))
+    assert kept["duration_ms"] == 5 and "_id" not in kept
@@ -4,6 +4,7 @@ from datetime import datetime
 from bson import ObjectId
 import pytest
 from app import db as dbmod
+from app.events import publish_status
 
 
 @pytest.mark.asyncio
@@ -47,7 +48,7 @@ async def test_sse_immediate_done(client):
     statuses = []
     async with client.stream(
         "GET",
-        f"/api/reviews/{sub_id}/stream?interval_ms=50&ping=0",
+        f"/api/reviews/{sub_id}/stream?ping=0",
         timeout=2.0,
     ) as s:
         event = None
@@ -92,24 +93,23 @@ async def test_sse_transition_to_done(client):
 
     async def finisher():
         await asyncio.sleep(0.1)
-        r_ins = await dbmod.reviews.insert_one(
-            {
-                "submission_id": sub_id,
-                "score": 7,
-                "issues": [
-                    {
-                        "title": "late",
-                        "detail": "arrived",
-                        "severity": "low",
-                        "category": "test",
-                    }
-                ],
-                "security": [],
-                "performance": [],
-                "suggestions": [],
-                "created_at": datetime.utcnow().isoformat(),
-            }
-        )
+        review = {
+            "submission_id": sub_id,
+            "score": 7,
+            "issues": [
+                {
+                    "title": "late",
+                    "detail": "arrived",
+                    "severity": "low",
+                    "category": "test",
+                }
+            ],
+            "security": [],
+            "performance": [],
+            "suggestions": [],
+            "created_at": datetime.utcnow().isoformat(),
+        }
+        r_ins = await dbmod.reviews.insert_one(review)
         await dbmod.submissions.update_one(
             {"_id": sub_id},
             {
@@ -120,13 +120,14 @@ async def test_sse_transition_to_done(client):
                 }
             },
         )
+        await publish_status(str(sub_id), "completed", review=review)
 
     fin_task = asyncio.create_task(finisher())
 
     statuses = []
     async with client.stream(
         "GET",
-        f"/api/reviews/{sub_id}/stream?interval_ms=50&ping=0",
+        f"/api/reviews/{sub_id}/stream?ping=0",
         timeout=3.0,
     ) as s:
         event = None
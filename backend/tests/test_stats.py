@@ -1,33 +1,20 @@
 import pytest
 from datetime import datetime
-from bson import ObjectId
-from app import db as dbmod
+from app.rollups import record_review
 
 
 @pytest.mark.asyncio
 async def test_stats_calculation(client):
     now = datetime.utcnow().isoformat()
-    r1 = await dbmod.reviews.insert_one(
+    await record_review(
+        "python",
+        now,
         {
-            "submission_id": ObjectId(),
             "score": 8,
             "issues": [
                 {"title": "X", "detail": "Y", "severity": "med", "category": "bug"}
             ],
-            "created_at": now,
-        }
-    )
-    await dbmod.submissions.insert_one(
-        {
-            "code": "print()",
-            "language": "python",
-            "status": "completed",
-            "created_at": now,
-            "updated_at": now,
-            "ip": "1.1.1.1",
-            "review_id": r1.inserted_id,
-            "error": None,
-        }
+        },
     )
     r = await client.get("/api/stats?language=python")
     assert r.status_code == 200
@@ -35,3 +22,43 @@ async def test_stats_calculation(client):
     assert data["total"] >= 1
     assert data["avg_score"] is None or isinstance(data["avg_score"], (int, float))
     assert isinstance(data["common_issues"], list)
+    assert "X" in data["common_issues"]
+
+
+@pytest.mark.asyncio
+async def test_stats_timeseries_buckets(client):
+    for ts, score in (
+        ("2024-03-01T10:15:00", 6),
+        ("2024-03-01T11:40:00", 8),
+        ("2024-03-02T09:00:00", 4),
+    ):
+        await record_review("go", ts, {"score": score, "issues": [{"title": "a.b"}]})
+
+    r = await client.get(
+        "/api/stats/timeseries?language=go&start=2024-03-01T00:00:00"
+        "&end=2024-03-03T00:00:00&bucket=day"
+    )
+    assert r.status_code == 200
+    points = r.json()
+    assert [p["total"] for p in points] == [2, 1]
+    assert points[0]["avg_score"] == 7.0
+    assert points[0]["histogram"] == {"6": 1, "8": 1}
+
+    r = await client.get("/api/stats?language=go&start=2024-03-01T00:00:00")
+    assert r.json()["common_issues"] == ["a.b"]
+
+
+@pytest.mark.asyncio
+async def test_stats_range_includes_the_hour_of_an_unaligned_end(client):
+    await record_review("rust", "2024-04-01T10:15:00", {"score": 5, "issues": []})
+    await record_review("rust", "2024-04-01T11:05:00", {"score": 9, "issues": []})
+
+    r = await client.get(
+        "/api/stats?language=rust&start=2024-04-01T10:00:00&end=2024-04-01T10:30:00"
+    )
+    assert r.json()["total"] == 1
+
+    r = await client.get(
+        "/api/stats?language=rust&start=2024-04-01T10:00:00&end=2024-04-01T11:00:00"
+    )
+    assert r.json()["total"] == 1
@@ -20,3 +20,53 @@ async def test_submit_then_worker_then_get_review(client, stub_ai_review, run_wo
     assert r2.status_code == 200
     review = r2.json()
     assert review["status"] in ("completed", "failed")
+
+
+@pytest.mark.asyncio
+async def test_completed_review_served_from_cache(client, stub_ai_review, run_worker):
+    from bson import ObjectId
+    from app import db as dbmod
+
+    r = await client.post(
+        "/api/reviews", json={"language": "go", "code": "package main\n"}
+    )
+    sub_id = r.json()["id"]
+    await run_worker(sub_id)
+
+    first = await client.get(f"/api/reviews/{sub_id}")
+    assert first.json()["status"] == "completed"
+
+    await dbmod.submissions.delete_one({"_id": ObjectId(sub_id)})
+    again = await client.get(f"/api/reviews/{sub_id}")
+    assert again.status_code == 200
+    assert again.json() == first.json()
+
+
+@pytest.mark.asyncio
+async def test_worker_claims_only_pending_or_stale(stub_ai_review, run_worker):
+    from datetime import datetime, timedelta
+    from app import db as dbmod
+
+    now = datetime.utcnow()
+    stale = (now - timedelta(hours=1)).isoformat()
+    base = {
+        "code": "x = 1\n",
+        "language": "python",
+        "created_at": stale,
+        "review_id": None,
+        "error": None,
+    }
+    held = await dbmod.submissions.insert_one(
+        {**base, "status": "in_progress", "updated_at": now.isoformat()}
+    )
+    abandoned = await dbmod.submissions.insert_one(
+        {**base, "status": "in_progress", "updated_at": stale}
+    )
+
+    await run_worker(str(held.inserted_id))
+    await run_worker(str(abandoned.inserted_id))
+
+    sub = await dbmod.submissions.find_one({"_id": held.inserted_id})
+    assert sub["status"] == "in_progress" and sub["review_id"] is None
+    sub = await dbmod.submissions.find_one({"_id": abandoned.inserted_id})
+    assert sub["status"] == "completed"
@@ -0,0 +1,68 @@
+import pytest
+from app.config import settings
+from app import tokens
+from app.tokens import count_tokens, max_output_tokens, minify
+
+
+def test_minify_drops_header_comments_and_blank_runs():
+    code = (
+        "# Copyright 2024 Example Corp\n"
+        "# Licensed under the MIT License\n"
+        "\n"
+        "import os  # inline comments stay\n"
+        "\n\n\n\n"
+        "def f():\n"
+        "    # gone\n"
+        '    s = """\n'
+        "    # inside a string: kept\n"
+        '    """\n'
+        "    return s   \n"
+    )
+    assert minify("python", code) == (
+        "import os  # inline comments stay\n"
+        "\n"
+        "def f():\n"
+        '    s = """\n'
+        "    # inside a string: kept\n"
+        '    """\n'
+        "    return s"
+    )
+
+
+def test_minify_keeps_preprocessor_lines():
+    code = "#include <stdio.h>\n// note\nint main() { return 0; }\n"
+    assert minify("c", code) == "#include <stdio.h>\nint main() { return 0; }"
+
+
+def test_minify_does_not_treat_includes_as_a_license_header():
+    code = '#include <stdio.h>\n#include "license.h"\nint main() { return 0; }\n'
+    assert minify("c", code) == code.rstrip("\n")
+
+
+def test_output_budget_scales_within_bounds():
+    assert max_output_tokens(0) == settings.LLM_OUTPUT_TOKENS_MIN
+    assert max_output_tokens(400) > max_output_tokens(100)
+    assert max_output_tokens(10**6) == settings.LLM_OUTPUT_TOKENS_MAX
+
+
+@pytest.mark.asyncio
+async def test_over_budget_rejected_without_large_file_path(client, monkeypatch):
+    monkeypatch.setattr(settings, "LARGE_FILE_ENABLED", False)
+    monkeypatch.setattr(settings, "LLM_INPUT_TOKEN_BUDGET", 50)
+    code = "\n".join(f"x{i} = {i}" for i in range(200))
+    r = await client.post("/api/reviews", json={"language": "python", "code": code})
+    assert r.status_code == 413
+
+
+def test_count_tokens_estimates_when_the_encoding_cannot_load(monkeypatch):
+    class Offline:
+        @staticmethod
+        def encoding_for_model(model):
+            raise OSError("no network")
+
+    monkeypatch.setattr(tokens, "tiktoken", Offline)
+    tokens._encoding.cache_clear()
+    try:
+        assert count_tokens("x" * 40) == 11
+    finally:
+        tokens._encoding.cache_clear()
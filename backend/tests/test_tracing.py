@@ -0,0 +1,34 @@
+import json
+import pytest
+from app import tracing
+from app.config import settings
+
+pytest.importorskip("opentelemetry.sdk")
+
+
+@pytest.fixture
+def jsonl_traces(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(settings, "TRACING_EXPORTER", "jsonl")
+    monkeypatch.setattr(settings, "TRACING_JSONL_PATH", str(path))
+    tracing.init_tracing("test")
+    yield path
+    tracing.shutdown_tracing()
+
+
+def test_context_survives_the_task_headers(jsonl_traces):
+    with tracing.span("submit_review"):
+        headers = tracing.inject()
+    assert "traceparent" in headers
+
+    with tracing.span("process_review", context=tracing.extract(headers)):
+        tracing.record_span("mongo insert", 0.002)
+    tracing.shutdown_tracing()
+
+    spans = {
+        s["name"]: s for s in map(json.loads, jsonl_traces.read_text().splitlines())
+    }
+    assert len({s["trace_id"] for s in spans.values()}) == 1
+    assert spans["process_review"]["parent_id"] == spans["submit_review"]["span_id"]
+    assert spans["mongo insert"]["parent_id"] == spans["process_review"]["span_id"]
+    assert spans["mongo insert"]["duration_ms"] == pytest.approx(2, abs=0.5)
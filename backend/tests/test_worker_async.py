@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from bson import ObjectId
+from app import ai as ai_mod
+from app import db as dbmod
+from app.config import settings
+
+
+@pytest.mark.asyncio
+async def test_async_mode_runs_reviews_concurrently_on_one_loop(monkeypatch):
+    import worker
+    from app.cache import close_cache
+
+    monkeypatch.setattr(settings, "WORKER_MODE", "async")
+    monkeypatch.setattr(settings, "LLM_BATCH_ENABLED", False)
+    # keep the session's Mongo client open through the worker shutdown
+    monkeypatch.setattr(worker, "close_db_sync", lambda: None)
+    # the worker's loop opens its own clients
+    await close_cache()
+
+    loops = set()
+    in_flight = peak = 0
+
+    async def slow_review(language: str, code: str):
+        nonlocal in_flight, peak
+        loops.add(asyncio.get_running_loop())
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.2)
+        in_flight -= 1
+        return {"score": 6, "issues": [], "security": [], "suggestions": []}
+
+    monkeypatch.setattr(ai_mod, "review_code_async", slow_review)
+
+    ids = []
+    for i in range(4):
+        ins = await dbmod.submissions.insert_one(
+            {
+                "code": f"v = {i}\n",
+                "language": "python",
+                "status": "pending",
+                "created_at": "2024-01-01T00:00:00",
+                "updated_at": "2024-01-01T00:00:00",
+                "review_id": None,
+                "error": None,
+            }
+        )
+        ids.append(str(ins.inserted_id))
+
+    try:
+        # Celery's thread pool: each task blocks its own thread on the shared loop
+        results = await asyncio.gather(
+            *(asyncio.to_thread(worker.process_review, sid) for sid in ids)
+        )
+    finally:
+        await asyncio.to_thread(worker._on_worker_shutdown)
+
+    assert results == [True] * 4
+    assert peak == 4
+    assert len(loops) == 1 and asyncio.get_running_loop() not in loops
+    assert worker._LOOP is None and worker._LOOP_THREAD is None
+
+    oids = [ObjectId(i) for i in ids]
+    async for sub in dbmod.submissions.find({"_id": {"$in": oids}}):
+        assert sub["status"] == "completed"
@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from bson import ObjectId
+from app import db as dbmod
+from app.write_behind import CompletionWriter
+
+
+@pytest.mark.asyncio
+async def test_completions_flush_as_one_batch():
+    sub_ids = []
+    for i in range(3):
+        ins = await dbmod.submissions.insert_one(
+            {"language": "python", "code": f"x = {i}", "status": "in_progress"}
+        )
+        sub_ids.append(ins.inserted_id)
+
+    writer = CompletionWriter(max_items=3, max_wait_ms=1000)
+    reviews = [{"_id": ObjectId(), "submission_id": s, "score": 7} for s in sub_ids]
+    await asyncio.wait_for(
+        asyncio.gather(
+            *(
+                writer.submit(r, s, {"status": "completed", "review_id": r["_id"]})
+                for r, s in zip(reviews, sub_ids)
+            )
+        ),
+        1.0,
+    )
+
+    for r, s in zip(reviews, sub_ids):
+        sub = await dbmod.submissions.find_one({"_id": s})
+        assert sub["status"] == "completed"
+        assert sub["review_id"] == r["_id"]
+        assert await dbmod.reviews.find_one({"_id": r["_id"]})
+
+
+@pytest.mark.asyncio
+async def test_failed_insert_leaves_submission_untouched():
+    ins = await dbmod.submissions.insert_one(
+        {"language": "python", "code": "y = 1", "status": "in_progress"}
+    )
+    review = {"_id": ObjectId(), "submission_id": ins.inserted_id}
+    await dbmod.reviews.insert_one(dict(review))
+
+    writer = CompletionWriter(max_items=10, max_wait_ms=10)
+    with pytest.raises(Exception):
+        await writer.submit(
+            review, ins.inserted_id, {"status": "completed", "review_id": review["_id"]}
+        )
+    sub = await dbmod.submissions.find_one({"_id": ins.inserted_id})
+    assert sub["status"] == "in_progress"
@@ -1,92 +1,350 @@
 import asyncio
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
 from bson import ObjectId
-from celery.signals import worker_process_init, worker_shutdown
+from pymongo import ReturnDocument
+from celery.signals import worker_init, worker_process_init, worker_shutdown
+from prometheus_client import start_http_server
 
 from app.queue import celery
-from app.ai import review_code_sync
+from app.config import settings
+from app import ai
+from app.batching import get_batcher, is_small
+from app.chunking import is_large, review_chunked
+from app.tokens import over_budget
+from app.incremental import review_incremental
+from app.write_behind import get_writer
+from app.routing import release as release_client
+from app.admission import record_completion
+from app.blobs import code_of
 from app import db as dbmod
 from app.db import init_db_sync, close_db_sync
-from app.cache import init_cache, close_cache, cache_set_review_id
+from app.cache import (
+    init_cache,
+    close_cache,
+    cache_set_review_id,
+    cache_set_review_payloads,
+    inflight_refresh,
+    inflight_release,
+)
+from app.events import init_events, close_events, publish_status
+from app.rollups import record_review
+from app.schemas import REVIEW_METADATA, ReviewOut, canonical_review
+from app.metrics import QUEUE_WAIT, REVIEWS, registry
+from app.tracing import extract, init_tracing, shutdown_tracing, span
 
 _LOOP: asyncio.AbstractEventLoop | None = None
+_LOOP_THREAD: threading.Thread | None = None
+_LOOP_LOCK = threading.Lock()
+
+
+async def _init_clients():
+    init_tracing("worker")
+    init_db_sync()
+    await init_cache()
+    await init_events()
+
+
+async def _close_clients():
+    await close_events()
+    await close_cache()
+    close_db_sync()
+    shutdown_tracing()
+
+
+def _start_loop_thread() -> asyncio.AbstractEventLoop:
+    """Async mode: one long-lived loop per process that all task threads share."""
+    global _LOOP, _LOOP_THREAD
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=loop.run_forever, name="review-loop", daemon=True
+            )
+            thread.start()
+            asyncio.run_coroutine_threadsafe(_init_clients(), loop).result()
+            _LOOP, _LOOP_THREAD = loop, thread
+        return _LOOP
+
+
+@worker_init.connect
+def _on_worker_init(**_):
+    # Runs once in the parent; prefork children are aggregated through
+    # PROMETHEUS_MULTIPROC_DIR.
+    if settings.WORKER_METRICS_PORT:
+        start_http_server(settings.WORKER_METRICS_PORT, registry=registry())
 
 
 @worker_process_init.connect
 def _on_worker_process_init(**_):
     global _LOOP
+    if settings.WORKER_MODE == "async":
+        return
     if _LOOP is None:
         _LOOP = asyncio.new_event_loop()
         asyncio.set_event_loop(_LOOP)
-        init_db_sync()
-        _LOOP.run_until_complete(init_cache())
+        _LOOP.run_until_complete(_init_clients())
 
 
 @worker_shutdown.connect
 def _on_worker_shutdown(**_):
-    global _LOOP
+    global _LOOP, _LOOP_THREAD
+    if _LOOP is None:
+        return
     try:
-        if _LOOP is not None:
-            _LOOP.run_until_complete(close_cache())
-        close_db_sync()
+        if _LOOP_THREAD is not None:
+            asyncio.run_coroutine_threadsafe(_close_clients(), _LOOP).result()
+        else:
+            _LOOP.run_until_complete(_close_clients())
     finally:
-        if _LOOP is not None:
-            _LOOP.close()
-            _LOOP = None
+        if _LOOP_THREAD is not None:
+            _LOOP.call_soon_threadsafe(_LOOP.stop)
+            _LOOP_THREAD.join()
+            _LOOP_THREAD = None
+        _LOOP.close()
+        _LOOP = None
+
+
+def _trace_carrier(request) -> dict:
+    # Custom message headers land on the request context (or under .headers,
+    # depending on the Celery version).
+    headers = getattr(request, "headers", None) or {}
+    carrier = {}
+    for key in ("traceparent", "tracestate"):
+        value = request.get(key) or headers.get(key)
+        if value:
+            carrier[key] = value
+    return carrier
 
 
-@celery.task(name="process_review")
-def process_review(submission_id: str):
+@celery.task(name="process_review", bind=True)
+def process_review(self, submission_id: str, client: Optional[str] = None):
     global _LOOP
+    carrier = _trace_carrier(self.request)
+    queue = (self.request.delivery_info or {}).get("routing_key")
+    if settings.WORKER_MODE == "async":
+        loop = _start_loop_thread()
+        return asyncio.run_coroutine_threadsafe(
+            _process(submission_id, client, carrier, queue), loop
+        ).result()
+
     if _LOOP is None:
         _LOOP = asyncio.new_event_loop()
         asyncio.set_event_loop(_LOOP)
-        init_db_sync()
-        _LOOP.run_until_complete(init_cache())
-    return _LOOP.run_until_complete(_run(submission_id))
+        _LOOP.run_until_complete(_init_clients())
+    return _LOOP.run_until_complete(_process(submission_id, client, carrier, queue))
+
+
+async def _process(
+    submission_id: str,
+    client: Optional[str],
+    carrier: dict,
+    queue: Optional[str] = None,
+):
+    try:
+        with span(
+            "process_review", context=extract(carrier), submission_id=submission_id
+        ):
+            done = await _run(submission_id)
+        if done:
+            await record_completion(queue)
+        return done
+    finally:
+        # frees the client's fair-share slot (see app.routing)
+        if client:
+            await release_client(client)
+
+
+async def _followers(leader_id: ObjectId) -> list:
+    return await dbmod.submissions.find(
+        {"leader_id": leader_id, "status": {"$nin": ["completed", "failed"]}},
+        {"_id": 1, "language": 1, "created_at": 1},
+    ).to_list(length=None)
+
+
+async def _fan_out(followers: list, fields: dict, status: str, review=None):
+    """Mirror the leader's state onto submissions that attached to it."""
+    if not followers:
+        return
+    await dbmod.submissions.update_many(
+        {"_id": {"$in": [f["_id"] for f in followers]}}, {"$set": fields}
+    )
+    for f in followers:
+        await publish_status(str(f["_id"]), status, review=review)
+
+
+async def _cache_payloads(subs: list, fields: dict, review=None):
+    """Pre-serialize the terminal ReviewOut so GET /api/reviews/{id} skips Mongo."""
+    try:
+        payloads = {
+            str(s["_id"]): ReviewOut.from_docs(
+                {**s, **fields}, review
+            ).model_dump_json()
+            for s in subs
+        }
+    except ValueError:
+        return
+    await cache_set_review_payloads(payloads)
+
+
+async def _review(language: str, code: str) -> dict:
+    if is_large(language, code):
+        return await review_chunked(language, code)
+    if over_budget(language, code):
+        raise ValueError("Code exceeds the review token budget")
+    # Batching only pays off when many reviews share one loop (async mode).
+    if (
+        settings.LLM_BATCH_ENABLED
+        and settings.WORKER_MODE == "async"
+        and is_small(code)
+    ):
+        return await get_batcher().review(language, code)
+    return await ai.review_code_async(language, code)
+
+
+async def _base_review(sub: dict):
+    """(code, review) of the submission this one was resubmitted against."""
+    base_id = sub.get("base_submission_id")
+    if not base_id:
+        return None
+    base = await dbmod.submissions.find_one(
+        {"_id": base_id, "status": "completed", "language": sub["language"]},
+        {"code": 1, "code_blob": 1, "review_id": 1},
+    )
+    if not base or not base.get("review_id"):
+        return None
+    review = await dbmod.reviews.find_one({"_id": base["review_id"]})
+    return (await code_of(base), review) if review else None
+
+
+async def _store_review(review: dict, submission_id: ObjectId, fields: dict):
+    """Insert the review and complete its submission.
+
+    Sequential by default so a completed submission never points at a missing
+    review; optionally one transaction (needs a replica set), or write-behind
+    batches when many reviews run in one loop.
+    """
+    if settings.WRITE_BEHIND_ENABLED and settings.WORKER_MODE == "async":
+        await get_writer().submit(review, submission_id, fields)
+        return
+    if settings.MONGO_TRANSACTIONS:
+        async with await dbmod.client.start_session() as session:
+            async with session.start_transaction():
+                await dbmod.reviews.insert_one(review, session=session)
+                await dbmod.submissions.update_one(
+                    {"_id": submission_id}, {"$set": fields}, session=session
+                )
+        return
+    await dbmod.reviews.insert_one(review)
+    await dbmod.submissions.update_one({"_id": submission_id}, {"$set": fields})
+
+
+async def _claim(submission_id: str):
+    """Claim and read in one round trip.
+
+    Only pending work is claimed, so a redelivered task never runs alongside
+    the worker that holds it; an in-progress claim older than the lease is
+    taken over (its worker is presumed dead).
+    """
+    now = datetime.utcnow()
+    stale = (now - timedelta(seconds=settings.WORKER_CLAIM_LEASE_SECONDS)).isoformat()
+    return await dbmod.submissions.find_one_and_update(
+        {
+            "_id": ObjectId(submission_id),
+            "$or": [
+                {"status": "pending"},
+                {"status": "in_progress", "updated_at": {"$lt": stale}},
+            ],
+        },
+        {"$set": {"status": "in_progress", "updated_at": now.isoformat()}},
+        return_document=ReturnDocument.AFTER,
+    )
 
 
 async def _run(submission_id: str):
-    sub = await dbmod.submissions.find_one({"_id": ObjectId(submission_id)})
+    sub = await _claim(submission_id)
     if not sub:
         return None
+    QUEUE_WAIT.observe(
+        (datetime.utcnow() - datetime.fromisoformat(sub["created_at"])).total_seconds()
+    )
 
-    await dbmod.submissions.update_one(
-        {"_id": sub["_id"]}, {"$set": {"status": "in_progress"}}
+    code_hash = sub.get("code_hash")
+    if code_hash:
+        # a long queue wait may have used up most of the slot's TTL; keep it
+        # for as long as this claim's lease so followers keep waiting on us
+        await inflight_refresh(
+            code_hash,
+            submission_id,
+            max(settings.INFLIGHT_TTL_SECONDS, settings.WORKER_CLAIM_LEASE_SECONDS),
+        )
+    await publish_status(submission_id, "in_progress")
+    await _fan_out(
+        await _followers(sub["_id"]), {"status": "in_progress"}, "in_progress"
     )
 
     try:
-        data = review_code_sync(sub["language"], sub["code"])
+        data = None
+        code = await code_of(sub)
+        base = await _base_review(sub)
+        if base is not None:
+            with span("review.incremental"):
+                data = await review_incremental(sub["language"], base[0], code, base[1])
+            if data is not None:
+                data["base_submission_id"] = sub["base_submission_id"]
+        if data is None:
+            with span("review.full", language=sub["language"]):
+                data = await _review(sub["language"], code)
+        now = datetime.utcnow().isoformat()
         doc = {
+            **canonical_review(data, require_score=False, keep=REVIEW_METADATA),
+            "_id": ObjectId(),
             "submission_id": sub["_id"],
-            **data,
-            "created_at": datetime.utcnow().isoformat(),
+            "created_at": now,
         }
-        ins = await dbmod.reviews.insert_one(doc)
+        completed = {
+            "status": "completed",
+            "review_id": doc["_id"],
+            "score": doc["score"],
+            "updated_at": now,
+        }
+        with span("review.store"):
+            await _store_review(doc, sub["_id"], completed)
 
-        code_hash = sub.get("code_hash")
         if code_hash:
-            await cache_set_review_id(code_hash, str(ins.inserted_id))
-
-        await dbmod.submissions.update_one(
-            {"_id": sub["_id"]},
-            {
-                "$set": {
-                    "status": "completed",
-                    "review_id": ins.inserted_id,
-                    "updated_at": datetime.utcnow().isoformat(),
-                }
-            },
-        )
+            await cache_set_review_id(code_hash, str(doc["_id"]))
     except Exception as e:
-        await dbmod.submissions.update_one(
-            {"_id": sub["_id"]},
-            {
-                "$set": {
-                    "status": "failed",
-                    "error": str(e),
-                    "updated_at": datetime.utcnow().isoformat(),
-                }
-            },
+        failed = {
+            "status": "failed",
+            "error": str(e),
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+        res = await dbmod.submissions.update_one(
+            {"_id": sub["_id"], "status": {"$ne": "completed"}}, {"$set": failed}
         )
+        if not res.modified_count:
+            # a worker that took over our lease already completed it
+            return None
+        # Release before reading followers: late joiners then settle themselves.
+        if code_hash:
+            await inflight_release(code_hash, submission_id)
+        followers = await _followers(sub["_id"])
+        await _fan_out(followers, failed, "failed")
+        await _cache_payloads([sub, *followers], failed)
+        await publish_status(submission_id, "failed")
+        REVIEWS.labels("failed").inc()
+        return True
+
+    if code_hash:
+        await inflight_release(code_hash, submission_id)
+    followers = await _followers(sub["_id"])
+    await _fan_out(followers, completed, "completed", review=doc)
+    await _cache_payloads([sub, *followers], {**completed, "error": None}, doc)
+
+    await record_review(sub["language"], sub["created_at"], doc)
+    for f in followers:
+        await record_review(f["language"], f["created_at"], doc)
+    await publish_status(submission_id, "completed", review=doc)
+    REVIEWS.labels("completed").inc()
     return True